@@ -0,0 +1,107 @@
+"""
+Сравнение декодирования ответов Gateway:
+
+    dict     - resp.json() + ручное копирование полей и fromisoformat
+               (прежний DataStorage.set_user_info / approved)
+    pydantic - model_validate_json в модели src.models (User, Profile, Payment)
+    records  - json_codec.loads(bytes) -> __slots__ записи src.models.records
+    memo     - повторное чтение уже разобранных записей (попадание в кэш Gateway)
+
+Запуск: python -m benchmarks.bench_decoding [iterations]
+"""
+import json
+import sys
+import timeit
+from datetime import datetime
+
+from src.models import User, Profile, Payment, PaymentRecord, ProfileRecord, UserRecord, UserBundle
+from src.utils import json_codec
+from src.utils.timer import get_current_datetime
+
+USER = json.dumps({
+    "user_id": 1, "username": "tester", "camefrom": "friends", "first_name": "Test",
+    "language": "english", "fluency": 2, "topics": ["travel", "music", "movies"], "lang_code": "en",
+}).encode()
+PROFILE = json.dumps({
+    "user_id": 1, "nickname": "tester01", "email": "t@example.com", "gender": "male",
+    "intro": "Hello there, I like languages", "birthday": "2000-05-17",
+    "dating": False, "status": "rookie",
+}).encode()
+PAYMENT = json.dumps({
+    "user_id": 1, "amount": 199.0, "period": "month", "trial": False, "is_active": True,
+    "until": "2030-01-01T00:00:00+03:00", "currency": "RUB", "payment_id": "pay_1",
+}).encode()
+
+
+def dict_path():
+    user_info, payment_info, profile_info = json.loads(USER), json.loads(PAYMENT), json.loads(PROFILE)
+    result = {
+        "user_id": 1,
+        "username": user_info["username"],
+        "first_name": user_info["first_name"],
+        "language": user_info["language"],
+        "fluency": user_info["fluency"],
+        "topics": ', '.join(user_info["topics"]),
+        "camefrom": user_info["camefrom"],
+        "lang_code": user_info["lang_code"],
+        "is_active": payment_info.get("is_active", False),
+        "due_to": payment_info.get("until"),
+    }
+    birthday = datetime.fromisoformat(profile_info["birthday"])
+    result.update({
+        "birthday": profile_info["birthday"],
+        "nickname": profile_info["nickname"],
+        "email": profile_info["email"],
+        "gender": profile_info["gender"],
+        "dating": profile_info["dating"],
+        "intro": profile_info['intro'],
+        "status": profile_info["status"],
+        "age": (get_current_datetime() - birthday).days // 365,
+    })
+    due_date = datetime.fromisoformat(payment_info["until"]).replace(tzinfo=None)
+    return result, due_date > get_current_datetime()
+
+
+def pydantic_path():
+    user = User.model_validate_json(USER)
+    profile = Profile.model_validate_json(PROFILE)
+    payment = Payment.model_validate_json(PAYMENT)
+    result = user.model_dump()
+    result.update(profile.model_dump())
+    result.update(is_active=payment.is_active, due_to=payment.until)
+    return result, payment.until.replace(tzinfo=None) > get_current_datetime()
+
+
+def records_path():
+    bundle = UserBundle(
+        user=UserRecord.from_dict(json_codec.loads(USER), 1),
+        payment=PaymentRecord.from_dict(json_codec.loads(PAYMENT), 1),
+        profile=ProfileRecord.from_dict(json_codec.loads(PROFILE), 1),
+    )
+    return bundle.to_storage(), bundle.payment.is_paid()
+
+
+MEMO = UserBundle(
+    user=UserRecord.from_dict(json_codec.loads(USER), 1),
+    payment=PaymentRecord.from_dict(json_codec.loads(PAYMENT), 1),
+    profile=ProfileRecord.from_dict(json_codec.loads(PROFILE), 1),
+)
+
+
+def memo_path():
+    return MEMO.to_storage(), MEMO.payment.is_paid()
+
+
+def main(iterations: int = 20_000):
+    codec = 'orjson' if json_codec.orjson is not None else 'json'
+    print(f'{iterations} decodes of user + profile + payment (codec: {codec})')
+    for name, func in (
+        ('dict', dict_path), ('pydantic', pydantic_path),
+        ('records', records_path), ('memo', memo_path),
+    ):
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(f'{name:>10}: {seconds / iterations * 1e6:8.2f} us/op')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,136 @@
+"""
+Нагрузочный прогон GatewayService против локального stand-in gateway.
+
+Поднимает benchmarks.stand_in_gateway в отдельном процессе и гоняет
+конкурентных "пользователей", повторяя профиль бота: get_user_bundle
+на каждый апдейт и get_payment на каждую проверку подписки.
+
+Запуск (переменные окружения те же, что у бота: LOG_LEVEL, REDIS_URL, ...):
+    python -m benchmarks.load_gateway --concurrency 200 --requests 20000 \\
+        --users 100000 --latency lognormal:0.02:0.4 --error-rate 0.005
+
+Транспорт клиента: --transport tcp | uds | http2. Для http2 stand-in
+поднимается на hypercorn; чтобы сравнить HTTP/1.1 на том же сервере,
+добавьте --http2 к --transport tcp (hypercorn понимает оба протокола).
+"""
+import argparse
+import asyncio
+import dataclasses
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+
+from benchmarks.stand_in_gateway import main as serve
+from src.config import config
+from src.services.gateway import GatewayService
+
+
+def start_server(port: int, server_args: list[str]) -> multiprocessing.Process:
+    process = multiprocessing.Process(
+        target=serve, args=(['--port', str(port), *server_args],), daemon=True
+    )
+    process.start()
+    return process
+
+
+async def wait_ready(port: int, uds: Optional[str] = None, timeout: float = 30.0) -> None:
+    loop_deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=uds)) as client:
+        while time.monotonic() < loop_deadline:
+            try:
+                await client.get(f'http://127.0.0.1:{port}/api/nicknames', params={'nickname': '-'})
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError('stand-in gateway did not start')
+
+
+async def run_load(
+    port: int, concurrency: int, total: int, users: int, hot: float,
+    transport: str = 'tcp', uds: Optional[str] = None,
+) -> None:
+    settings = dataclasses.replace(config.gateway, transport=transport, uds_path=uds)
+    gateway = GatewayService('127.0.0.1', port, settings)
+    gateway.connect()
+    rnd = random.Random(1)
+    # Горячее подмножество пользователей - как активные чаты в реальном боте
+    hot_users = max(1, int(users * hot))
+    latencies: list[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            user_id = rnd.randint(1, hot_users)
+            started = time.perf_counter()
+            try:
+                await gateway.get_user_bundle(user_id)
+                await gateway.get_payment(user_id)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await gateway.close()
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    snapshot = gateway.metrics.snapshot()
+    calls = sum(v for (name, _), v in snapshot.counters.items() if name == 'gateway_requests_total')
+
+    print(f'transport:    {gateway.transport}')
+    print(f'updates:      {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)')
+    print(f'errors:       {errors}')
+    print(f'latency ms:   p50={quantiles[49] * 1e3:.1f} p95={quantiles[94] * 1e3:.1f} '
+          f'p99={quantiles[98] * 1e3:.1f} max={latencies[-1] * 1e3:.1f}')
+    print(f'http calls:   {calls:.0f} ({calls / max(len(latencies), 1):.2f} per update)')
+    print(f'cache:        hits={gateway.cache.hits} redis={gateway.cache.redis_hits} '
+          f'misses={gateway.cache.misses} not_modified={gateway.cache.not_modified}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load GatewayService against the stand-in gateway')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--hot', type=float, default=0.05, help='share of users receiving traffic')
+    parser.add_argument('--external', action='store_true', help='do not spawn the stand-in gateway')
+    parser.add_argument('--transport', choices=('tcp', 'uds', 'http2'), default='tcp')
+    parser.add_argument('--uds-path', default=None, help='socket path for --transport uds')
+    args, server_args = parser.parse_known_args()
+
+    uds = None
+    if args.transport == 'uds':
+        uds = args.uds_path or os.path.join(tempfile.gettempdir(), f'stand-in-gateway-{args.port}.sock')
+        server_args += ['--uds', uds]
+    elif args.transport == 'http2' and '--http2' not in server_args:
+        server_args.append('--http2')
+
+    users = 10_000
+    if '--users' in server_args:
+        users = int(server_args[server_args.index('--users') + 1])
+
+    process = None if args.external else start_server(args.port, server_args)
+    try:
+        asyncio.run(wait_ready(args.port, uds))
+        asyncio.run(run_load(
+            args.port, args.concurrency, args.requests, users, args.hot, args.transport, uds
+        ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
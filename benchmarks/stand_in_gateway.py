@@ -0,0 +1,339 @@
+"""
+Локальная замена Gateway для бенчмарков и нагрузочного тестирования.
+
+Реализует все эндпоинты, которые вызывает GatewayService, поверх
+набора данных в памяти. Задержки, доля ошибок и размер набора данных
+настраиваются, чтобы воспроизводимо измерять оптимизации клиента.
+
+Запуск:
+    python -m benchmarks.stand_in_gateway --users 100000 \\
+        --latency lognormal:0.02:0.4 --tail 0.01:1.0 --error-rate 0.005 --port 8081
+
+HTTP/2 (h2c) отдается через hypercorn: --http2; Unix socket: --uds /tmp/gateway.sock
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+import uvicorn
+from fastapi import Body, FastAPI, Header, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from src.models import User
+from src.utils import json_codec
+
+LANGUAGES = ('english', 'german', 'russian', 'spanish', 'chinese')
+TOPICS = ('travel', 'music', 'movies', 'sport', 'science', 'food', 'art')
+LANG_CODES = ('en', 'ru', 'de', 'es', 'zh')
+
+
+@dataclass
+class Latency:
+    """
+    Распределение задержки ответа:
+        fixed:<sec> | uniform:<min>:<max> | lognormal:<median>:<sigma>
+    плюс "медленная реплика": с вероятностью tail_prob задержка tail_latency
+    """
+
+    kind: str = 'fixed'
+    a: float = 0.0
+    b: float = 0.0
+    tail_prob: float = 0.0
+    tail_latency: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str, tail: Optional[str] = None) -> "Latency":
+        kind, *values = spec.split(':')
+        values = [float(v) for v in values] + [0.0, 0.0]
+        tail_prob, tail_latency = (float(v) for v in tail.split(':')) if tail else (0.0, 0.0)
+        return cls(kind, values[0], values[1], tail_prob, tail_latency)
+
+    def sample(self, rnd: random.Random) -> float:
+        if self.tail_prob and rnd.random() < self.tail_prob:
+            return self.tail_latency
+        if self.kind == 'uniform':
+            return rnd.uniform(self.a, self.b)
+        if self.kind == 'lognormal':
+            return rnd.lognormvariate(0, self.b) * self.a if self.a else 0.0
+        return self.a
+
+
+@dataclass
+class StandInSettings:
+    users: int = 10_000                         # Размер набора данных
+    profile_share: float = 0.5                  # Доля пользователей с профилем
+    expired_share: float = 0.2                  # Доля просроченных подписок
+    latency: Latency = field(default_factory=Latency)
+    error_rate: float = 0.0                     # Доля ответов 503
+    conditional: bool = True                    # ETag / Last-Modified и ответы 304
+    seed: int = 42
+
+
+class Dataset:
+    """ Пользователи, профили и платежи в памяти """
+
+    def __init__(self, settings: StandInSettings):
+        rnd = random.Random(settings.seed)
+        now = datetime.now()
+        self.users: dict[int, dict] = {}
+        self.profiles: dict[int, dict] = {}
+        self.payments: dict[int, dict] = {}
+        self.idempotency: dict[str, int] = {}
+        # Время последнего изменения данных пользователя (для Last-Modified)
+        self.started = time.time()
+        self.modified: dict[int, float] = {}
+
+        for user_id in range(1, settings.users + 1):
+            self.users[user_id] = {
+                'user_id': user_id,
+                'username': f'user{user_id}',
+                'camefrom': rnd.choice(('friends', 'search', 'other')),
+                'first_name': f'Name{user_id}',
+                'language': rnd.choice(LANGUAGES),
+                'fluency': rnd.randint(0, 3),
+                'topics': rnd.sample(TOPICS, rnd.randint(1, 3)),
+                'lang_code': rnd.choice(LANG_CODES),
+            }
+            if rnd.random() < settings.profile_share:
+                self.profiles[user_id] = {
+                    'user_id': user_id,
+                    'nickname': f'nick{user_id}',
+                    'email': f'user{user_id}@example.com',
+                    'gender': rnd.choice(('male', 'female')),
+                    'intro': 'Hello! I am learning languages here.',
+                    'birthday': (date(1980, 1, 1) + timedelta(days=rnd.randint(0, 9000))).isoformat(),
+                    'dating': rnd.random() < 0.3,
+                    'status': 'rookie',
+                }
+            expired = rnd.random() < settings.expired_share
+            self.payments[user_id] = self.new_payment(
+                user_id, now + timedelta(days=-rnd.randint(1, 30) if expired else rnd.randint(1, 30))
+            )
+
+        self.nicknames = {p['nickname'] for p in self.profiles.values()}
+        # user_id по возрастанию - для постраничного обхода
+        self.order: list[int] = sorted(self.users)
+
+    def add(self, user: dict) -> None:
+        if user['user_id'] not in self.users:
+            bisect.insort(self.order, user['user_id'])
+        self.users[user['user_id']] = user
+
+    @staticmethod
+    def new_payment(user_id: int, until: datetime) -> dict:
+        return {
+            'user_id': user_id, 'amount': 199.0, 'period': 'month', 'trial': False,
+            'is_active': True, 'until': until.isoformat(), 'currency': 'RUB', 'payment_id': None,
+        }
+
+
+def create_app(settings: Optional[StandInSettings] = None) -> FastAPI:
+    settings = settings or StandInSettings()
+    data = Dataset(settings)
+    rnd = random.Random(settings.seed)
+    app = FastAPI(title='stand-in gateway')
+    app.state.settings = settings
+    app.state.data = data
+    # Ответы по статусам и переданные байты тела - для оценки экономии от 304
+    app.state.stats = Counter()
+
+    @app.middleware('http')
+    async def simulate(request: Request, call_next):
+        """ Задержка и случайные 503 для каждого запроса """
+        delay = settings.latency.sample(rnd)
+        if delay:
+            await asyncio.sleep(delay)
+        if settings.error_rate and rnd.random() < settings.error_rate:
+            return Response(status_code=503, content='stand-in: injected error')
+        return await call_next(request)
+
+    def many(user_ids: list[int], bulk: bool, fetch):
+        """ Один user_id -> ответ, bulk -> {"items": {"<user_id>": ответ}} """
+        if bulk:
+            return {'items': {str(user_id): fetch(user_id) for user_id in user_ids}}
+        return fetch(user_ids[0])
+
+    def touch(user_id: int) -> None:
+        data.modified[user_id] = time.time()
+
+    def conditional(request: Request, user_ids: list[int], bulk: bool, fetch) -> Response:
+        """ Ответ с ETag / Last-Modified; 304, если у клиента актуальная копия """
+        body = json_codec.dumps(many(user_ids, bulk, fetch))
+        if bulk or not settings.conditional:
+            app.state.stats['200'] += 1
+            app.state.stats['body_bytes'] += len(body)
+            return Response(body, media_type='application/json')
+
+        modified = int(data.modified.get(user_ids[0], data.started))
+        headers = {
+            'ETag': f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"',
+            'Last-Modified': formatdate(modified, usegmt=True),
+        }
+        if_none_match = request.headers.get('if-none-match')
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_none_match is not None:
+            not_modified = if_none_match == headers['ETag']
+        elif if_modified_since is not None:
+            not_modified = modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        else:
+            not_modified = False
+
+        if not_modified:
+            app.state.stats['304'] += 1
+            return Response(status_code=304, headers=headers)
+        app.state.stats['200'] += 1
+        app.state.stats['body_bytes'] += len(body)
+        return Response(body, media_type='application/json', headers=headers)
+
+    @app.get('/api/users')
+    async def get_users(
+        request: Request,
+        user_id: list[int] = Query(...),
+        target_field: Optional[str] = None,
+        bulk: bool = False,
+    ):
+        if target_field == 'users':
+            return conditional(request, user_id, bulk, data.users.get)
+        if target_field == 'profiles':
+            return conditional(
+                request, user_id, bulk, lambda uid: data.profiles.get(uid, {'error': 'profile not found'})
+            )
+        return many(user_id, bulk, lambda uid: uid in data.users)
+
+    @app.get('/api/users/page')
+    async def users_page(after: Optional[str] = None, limit: int = Query(500, ge=1, le=5000),
+                         target_field: str = 'users'):
+        """ Страница пользователей после курсора (последнего user_id предыдущей страницы) """
+        source = data.profiles if target_field == 'profiles' else data.users
+        start = bisect.bisect_right(data.order, int(after)) if after else 0
+        items, last = [], None
+        for user_id in data.order[start:start + limit]:
+            last = user_id
+            if user_id in source:
+                items.append(source[user_id])
+        more = start + limit < len(data.order)
+        return {'items': items, 'next': str(last) if more and last is not None else None}
+
+    @app.post('/api/users')
+    async def add_user(user: User, idempotency_key: Optional[str] = Header(None)):
+        if idempotency_key and idempotency_key in data.idempotency:
+            return {'user_id': data.idempotency[idempotency_key], 'replayed': True}
+
+        data.add(user.model_dump())
+        data.payments[user.user_id] = data.new_payment(user.user_id, datetime.now() + timedelta(days=3))
+        touch(user.user_id)
+        if idempotency_key:
+            data.idempotency[idempotency_key] = user.user_id
+        return {'user_id': user.user_id}
+
+    @app.get('/api/nicknames')
+    async def nickname_exists(nickname: str):
+        return nickname in data.nicknames
+
+    @app.get('/api/payment_data')
+    async def payment_data(request: Request, user_id: list[int] = Query(...), bulk: bool = False):
+        return conditional(request, user_id, bulk, data.payments.get)
+
+    @app.get('/api/user_bundle')
+    async def user_bundle(user_id: int):
+        if user_id not in data.users:
+            return {}
+        return {
+            'user': data.users[user_id],
+            'payment': data.payments.get(user_id),
+            'profile': data.profiles.get(user_id, {'error': 'profile not found'}),
+        }
+
+    @app.get('/api/due_to')
+    async def due_to(user_id: int):
+        payment = data.payments.get(user_id)
+        return payment['until'] if payment else None
+
+    @app.get('/api/yookassa_link')
+    async def yookassa_link(user_id: int):
+        if user_id not in data.users:
+            return JSONResponse(status_code=404, content={'detail': 'user not found'})
+        return f'https://yookassa.example/pay/{user_id}'
+
+    @app.post('/api/toggle_sub')
+    async def toggle_sub(payload: dict = Body(...)):
+        payment = data.payments.get(int(payload['user_id']))
+        if payment is None:
+            return JSONResponse(status_code=404, content={'detail': 'payment not found'})
+        payment['is_active'] = bool(payload['activate'])
+        touch(payment['user_id'])
+        return {'user_id': payment['user_id'], 'is_active': payment['is_active']}
+
+    @app.put('/api/update_profile')
+    async def update_profile(payload: dict = Body(...)):
+        user_id = int(payload['user_id'])
+        # Профиль отличается от пользователя наличием nickname
+        target = data.profiles if 'nickname' in payload else data.users
+        target.setdefault(user_id, {}).update(payload)
+        if 'nickname' in payload:
+            data.nicknames.add(payload['nickname'])
+        touch(user_id)
+        return {'user_id': user_id}
+
+    return app
+
+
+def parse_args(argv: Optional[list[str]] = None) -> tuple[StandInSettings, argparse.Namespace]:
+    parser = argparse.ArgumentParser(description='Stand-in gateway for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--uds', default=None, help='Unix socket path instead of host/port')
+    parser.add_argument('--http2', action='store_true', help='serve HTTP/2 (h2c) via hypercorn')
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--latency', default='fixed:0', help='fixed:S | uniform:A:B | lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--tail', default=None, help='PROB:SECONDS slow replica tail, e.g. 0.01:1.0')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-conditional', action='store_true', help='disable ETag / 304 responses')
+    args = parser.parse_args(argv)
+
+    settings = StandInSettings(
+        users=args.users,
+        latency=Latency.parse(args.latency, args.tail),
+        error_rate=args.error_rate,
+        conditional=not args.no_conditional,
+        seed=args.seed,
+    )
+    return settings, args
+
+
+def serve_http2(app: FastAPI, args: argparse.Namespace) -> None:
+    """ uvicorn не умеет HTTP/2 - для него нужен hypercorn (необязательная зависимость) """
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    hc = Config()
+    hc.bind = [f'unix:{args.uds}' if args.uds else f'{args.host}:{args.port}']
+    hc.loglevel = 'WARNING'
+    hc.accesslog = None
+    # По умолчанию hypercorn закрывает соединение после 1000 запросов (GOAWAY),
+    # а HTTP/2 клиент держит все потоки в одном соединении
+    hc.keep_alive_max_requests = 10 ** 9
+    asyncio.run(serve(app, hc))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    settings, args = parse_args(argv)
+    if args.http2:
+        return serve_http2(create_app(settings), args)
+    uvicorn.run(
+        create_app(settings), host=args.host, port=args.port, uds=args.uds,
+        log_level='warning', access_log=False,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import timezone, timedelta
 
 from dotenv import load_dotenv
@@ -7,20 +7,165 @@ from dotenv import load_dotenv
 load_dotenv(".env")
 
 
+def parse_float_map(raw: str | None) -> dict[str, float]:
+    """ Разбирает строку вида 'payment_data=2.5,yookassa_link=5' в словарь """
+    result = {}
+    for pair in (raw or '').split(','):
+        if '=' not in pair:
+            continue
+        key, value = pair.split('=', 1)
+        result[key.strip()] = float(value)
+    return result
+
+
 @dataclass
 class BotConfig:
     token: str = os.getenv("BOT_TOKEN")
     admin_id: int = os.getenv("ADMIN_ID")
     abs_img_path: str = os.getenv("ABS_IMG_PATH")
+    # Дедлайн обработки callback (сек.), пока Telegram ждет ответа на него
+    callback_deadline: float = float(os.getenv("CALLBACK_DEADLINE", 10.0))
+    # Предзагрузка данных пользователя при получении апдейта
+    prefetch_user_context: bool = os.getenv("PREFETCH_USER_CONTEXT", "true").lower() == "true"
+    # Прогрев соединений при старте: сколько ждать Gateway (сек.) и файл готовности для пробы
+    warmup_timeout: float = float(os.getenv("WARMUP_TIMEOUT", 30.0))
+    # Деградированный режим: стартовать с холодным пулом, если Gateway не ответил за warmup_timeout.
+    # По умолчанию бот не становится готовым, пока Gateway недоступен
+    start_without_gateway: bool = os.getenv("START_WITHOUT_GATEWAY", "false").lower() == "true"
+    ready_file: str = os.getenv("READY_FILE")
 
 @dataclass
 class GatewayConfig:
     host: str = os.getenv('GATEWAY_HOST')
     port: int = os.getenv('GATEWAY_PORT')
 
+    # Транспорт: tcp (HTTP/1.1), uds (HTTP/1.1 через Unix socket Gateway на том же хосте)
+    # или http2 (h2c, нужен пакет h2) - запросы мультиплексируются в http2_connections соединениях
+    transport: str = os.getenv('GATEWAY_TRANSPORT', 'tcp').lower()
+    uds_path: str = os.getenv('GATEWAY_UDS_PATH')
+    http2_connections: int = int(os.getenv('GATEWAY_HTTP2_CONNECTIONS', 4))
+
+    # Пул соединений httpx
+    max_connections: int = int(os.getenv('GATEWAY_MAX_CONNECTIONS', 100))
+    max_keepalive_connections: int = int(os.getenv('GATEWAY_MAX_KEEPALIVE', 20))
+    keepalive_expiry: float = float(os.getenv('GATEWAY_KEEPALIVE_EXPIRY', 30.0))
+
+    # Таймауты по умолчанию (секунды)
+    connect_timeout: float = float(os.getenv('GATEWAY_CONNECT_TIMEOUT', 2.0))
+    read_timeout: float = float(os.getenv('GATEWAY_READ_TIMEOUT', 5.0))
+    write_timeout: float = float(os.getenv('GATEWAY_WRITE_TIMEOUT', 10.0))
+    pool_timeout: float = float(os.getenv('GATEWAY_POOL_TIMEOUT', 2.0))
+
+    # Прогрев: число keep-alive соединений, открываемых при старте,
+    # и однократное разрешение имени хоста Gateway
+    warmup_connections: int = int(os.getenv('GATEWAY_WARMUP_CONNECTIONS', 10))
+    resolve_once: bool = os.getenv('GATEWAY_RESOLVE_ONCE', 'true').lower() == 'true'
+
+    # Таймауты чтения для отдельных методов, e.g. 'yookassa_link=8,add_user=10'
+    endpoint_timeouts: dict[str, float] = field(
+        default_factory=lambda: parse_float_map(os.getenv('GATEWAY_ENDPOINT_TIMEOUTS'))
+    )
+
+    # Составной эндпоинт /api/user_bundle (users + payment_data + profiles за один запрос)
+    bundle_endpoint: bool = os.getenv('GATEWAY_BUNDLE_ENDPOINT', 'false').lower() == 'true'
+
+    # Автомат защиты (circuit breaker) для каждого метода
+    breaker_failure_threshold: int = int(os.getenv('GATEWAY_BREAKER_FAILURES', 5))
+    breaker_recovery_timeout: float = float(os.getenv('GATEWAY_BREAKER_RECOVERY', 10.0))
+    breaker_half_open_calls: int = int(os.getenv('GATEWAY_BREAKER_HALF_OPEN_CALLS', 1))
+    # Сколько секунд после истечения TTL кэш можно отдавать при недоступном Gateway
+    stale_ttl: float = float(os.getenv('GATEWAY_STALE_TTL', 3600))
+
+    # Повторы идемпотентных запросов с экспоненциальной задержкой
+    retry_attempts: int = int(os.getenv('GATEWAY_RETRY_ATTEMPTS', 3))
+    retry_base_delay: float = float(os.getenv('GATEWAY_RETRY_BASE_DELAY', 0.05))
+    retry_max_delay: float = float(os.getenv('GATEWAY_RETRY_MAX_DELAY', 1.0))
+    # Доля повторов от общего трафика и минимум повторов в секунду
+    retry_budget_ratio: float = float(os.getenv('GATEWAY_RETRY_BUDGET_RATIO', 0.1))
+    retry_budget_min_per_second: float = float(os.getenv('GATEWAY_RETRY_BUDGET_MIN_RPS', 1.0))
+
+    # Адаптивный таймаут чтения: p99 * multiplier в пределах [timeout_min, таймаут метода]
+    timeout_multiplier: float = float(os.getenv('GATEWAY_TIMEOUT_MULTIPLIER', 3.0))
+    timeout_min: float = float(os.getenv('GATEWAY_TIMEOUT_MIN', 0.25))
+    timeout_min_samples: int = int(os.getenv('GATEWAY_TIMEOUT_MIN_SAMPLES', 100))
+
+    # Хеджирование: повторная отправка медленного запроса после p-го перцентиля
+    hedge_methods: frozenset[str] = frozenset(
+        m.strip() for m in os.getenv('GATEWAY_HEDGE_METHODS', 'payment_data,user_data').split(',') if m.strip()
+    )
+    hedge_percentile: float = float(os.getenv('GATEWAY_HEDGE_PERCENTILE', 95))
+    hedge_ratio: float = float(os.getenv('GATEWAY_HEDGE_RATIO', 0.05))
+    hedge_min_samples: int = int(os.getenv('GATEWAY_HEDGE_MIN_SAMPLES', 50))
+
+    # Bulkhead: лимиты параллельных запросов по методам (e.g. 'yookassa_link=4'),
+    # глубина очереди ожидающих и максимальное время ожидания в ней (сек.)
+    bulkhead_limits: dict[str, float] = field(
+        default_factory=lambda: parse_float_map(os.getenv('GATEWAY_BULKHEAD_LIMITS'))
+    )
+    bulkhead_queue: int = int(os.getenv('GATEWAY_BULKHEAD_QUEUE', 100))
+    bulkhead_queue_timeout: float = float(os.getenv('GATEWAY_BULKHEAD_QUEUE_TIMEOUT', 1.0))
+
+    # Полосы приоритета: общий лимит запросов, бюджет фоновой полосы
+    # и веса полос при раздаче освободившихся слотов
+    lanes_total: int = int(os.getenv('GATEWAY_LANES_TOTAL', 100))
+    background_limit: int = int(os.getenv('GATEWAY_BACKGROUND_LIMIT', 20))
+    lane_weights: dict[str, float] = field(
+        default_factory=lambda: {
+            'interactive': 9.0, 'background': 1.0,
+            **parse_float_map(os.getenv('GATEWAY_LANE_WEIGHTS')),
+        }
+    )
+
+    # Пакетная загрузка user_data / payment_data / check_user_exists (?user_id=1&user_id=2...&bulk=true,
+    # Gateway отвечает {"items": {"<user_id>": ...}})
+    batch_enabled: bool = os.getenv('GATEWAY_BATCH_ENABLED', 'false').lower() == 'true'
+    batch_window: float = float(os.getenv('GATEWAY_BATCH_WINDOW', 0.005))
+    batch_max_size: int = int(os.getenv('GATEWAY_BATCH_MAX_SIZE', 100))
+
+    # Кэш подписки для approved: запись живет до истечения оплаченного периода,
+    # но не дольше страховочного TTL (на случай потерянного события инвалидации)
+    entitlement_safety_ttl: float = float(os.getenv('ENTITLEMENT_SAFETY_TTL', 300))
+    entitlement_cache_size: int = int(os.getenv('ENTITLEMENT_CACHE_SIZE', 50_000))
+
+    # Потоковый обход всех пользователей (GatewayService.iter_users):
+    # размер страницы и сколько страниц загружать наперед
+    page_size: int = int(os.getenv('GATEWAY_PAGE_SIZE', 500))
+    page_prefetch: int = int(os.getenv('GATEWAY_PAGE_PREFETCH', 2))
+
+    # Отложенная запись изменений профиля: окно склейки, максимальная задержка (сек.)
+    # и число попыток записи при временных сбоях Gateway
+    profile_write_debounce: float = float(os.getenv('PROFILE_WRITE_DEBOUNCE', 5.0))
+    profile_write_max_delay: float = float(os.getenv('PROFILE_WRITE_MAX_DELAY', 30.0))
+    profile_write_max_attempts: int = int(os.getenv('PROFILE_WRITE_MAX_ATTEMPTS', 5))
+
+    # Outbox записей в Gateway (Redis stream): число партиций, аренда партиции (сек.),
+    # размер пачки чтения и максимальная задержка между повторами доставки
+    outbox_enabled: bool = os.getenv('GATEWAY_OUTBOX_ENABLED', 'true').lower() == 'true'
+    outbox_partitions: int = int(os.getenv('GATEWAY_OUTBOX_PARTITIONS', 4))
+    outbox_lease: float = float(os.getenv('GATEWAY_OUTBOX_LEASE', 10.0))
+    outbox_batch: int = int(os.getenv('GATEWAY_OUTBOX_BATCH', 32))
+    outbox_retry_max_delay: float = float(os.getenv('GATEWAY_OUTBOX_RETRY_MAX_DELAY', 30.0))
+
+    # Экспорт метрик клиента в текстовом формате Prometheus (файл для textfile collector)
+    metrics_file: str = os.getenv('GATEWAY_METRICS_FILE')
+    metrics_export_interval: float = float(os.getenv('GATEWAY_METRICS_INTERVAL', 15.0))
+
+    # Кэш ответов Gateway: время жизни (сек.) и размер для отдельных методов
+    cache_enabled: bool = os.getenv('GATEWAY_CACHE_ENABLED', 'true').lower() == 'true'
+    cache_ttls: dict[str, float] = field(
+        default_factory=lambda: parse_float_map(os.getenv('GATEWAY_CACHE_TTLS'))
+    )
+    cache_sizes: dict[str, float] = field(
+        default_factory=lambda: parse_float_map(os.getenv('GATEWAY_CACHE_SIZES'))
+    )
+
 @dataclass
 class RedisConfig:
     url: str = os.getenv("REDIS_URL")
+    # Канал pub/sub, по которому сервисы сообщают об изменении данных пользователя
+    invalidation_channel: str = os.getenv("REDIS_INVALIDATION_CHANNEL", "tg_bot:invalidate")
+    # Соединения пула, открываемые при старте
+    warmup_connections: int = int(os.getenv("REDIS_WARMUP_CONNECTIONS", 5))
 
 @dataclass
 class Config:
@@ -40,4 +185,4 @@ class Config:
         if not self.redis: self.redis = RedisConfig()
 
 
-config = Config()
\ No newline at end of file
+config = Config()
@@ -1,15 +1,35 @@
 from typing import TYPE_CHECKING
 
+from src.services.entitlements import entitlement_cache
 from src.services.gateway import gateway_service
+from src.services.invalidation import invalidation_bus
+from src.services.outbox import gateway_outbox
+from src.services.profile_writer import profile_writer
 from src.services.redis import redis_service
 
 if TYPE_CHECKING:
+    from src.services.entitlements import EntitlementCache
     from src.services.gateway import GatewayService
+    from src.services.invalidation import InvalidationBus
+    from src.services.outbox import GatewayOutbox
+    from src.services.profile_writer import ProfileWriter
     from src.services.redis import RedisService
 
+async def get_entitlement_cache() -> "EntitlementCache":
+    return entitlement_cache
+
 async def get_gateway() -> "GatewayService":
     return gateway_service
 
+async def get_invalidation_bus() -> "InvalidationBus":
+    return invalidation_bus
+
+async def get_outbox() -> "GatewayOutbox":
+    return gateway_outbox
+
+async def get_profile_writer() -> "ProfileWriter":
+    return profile_writer
+
 async def get_redis() -> "RedisService":
     if not redis_service.initialized:
         await redis_service.connect()
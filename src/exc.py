@@ -42,4 +42,26 @@ class InvalidCharactersError(Exception):
 
 
 class FailToCreateToken(Exception):
-    """ Ошибка при создании токена """
\ No newline at end of file
+    """ Ошибка при создании токена """
+
+class GatewayUnavailable(Exception):
+    """ Gateway недоступен: цепь разомкнута, запрос не отправлялся """
+
+    def __init__(self, method_name: str, retry_after: float = 0.0):
+        self.method_name = method_name
+        self.retry_after = retry_after
+        super().__init__(f'Gateway method {method_name} is unavailable, retry after {retry_after:.1f}s')
+
+
+class BulkheadFull(GatewayUnavailable):
+    """ Лимит параллельных запросов метода исчерпан, очередь полна или ожидание истекло """
+
+    def __init__(self, method_name: str, reason: str):
+        super().__init__(method_name)
+        self.reason = reason
+        self.args = (f'Gateway method {method_name} is saturated ({reason})',)
+
+
+class DeadlineExceeded(Exception):
+    """ Запрос к Gateway не успевает завершиться до дедлайна обработки апдейта """
+    pass
@@ -1,12 +1,14 @@
-from datetime import datetime
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Optional, Union
 
-import httpx
 from aiogram.fsm.context import FSMContext
 
-from src.dependencies import get_gateway
 from src.config import config
+from src.dependencies import get_entitlement_cache
+from src.exc import GatewayUnavailable
 from src.logconf import opt_logger as log
+from src.models import PaymentRecord, Entitlement
+from src.services.gateway_cache import MISS
+from src.utils import prefetch
 from src.utils.timer import get_current_datetime
 
 if TYPE_CHECKING:
@@ -15,45 +17,54 @@ if TYPE_CHECKING:
 logger = log.setup_logger("approved")
 
 
-async def approved(callback: Union["CallbackQuery", "Message"], state: FSMContext = None):
+async def approved(
+    callback: Union["CallbackQuery", "Message"],
+    state: FSMContext = None,
+    entitlement: Optional[Entitlement] = None,
+):
     """Проверяет, не истекла ли подписка пользователя"""
 
-    user_id = callback.from_user.id
+    # EntitlementMiddleware уже вычислил доступ для этого апдейта
+    if entitlement is None:
+        entitlement = await resolve_entitlement(callback.from_user.id, state)
+    return entitlement.allowed
+
+
+async def resolve_entitlement(user_id: int, state: FSMContext = None) -> Entitlement:
+    """ Доступ пользователя по данным подписки (кэш -> Gateway -> FSM) """
+
+    entitlements = await get_entitlement_cache()
 
     try:
+        # Ответ не меняется до истечения подписки или события оплаты
+        payment = entitlements.get(user_id)
+        if payment is not MISS:
+            return Entitlement.from_payment(payment, get_current_datetime())
+
+        try:
+            # Ждет предзагрузку апдейта или отправляет запрос в GateWay -> PaymentRecord
+            payment = await prefetch.get_payment(user_id)
+            entitlements.set(user_id, payment)
+        except GatewayUnavailable:
+            # Gateway недоступен: проверяем по последним данным из FSM
+            s_data = await state.get_data() if state else {}
+            if not s_data.get('due_to'): raise
+            logger.info(f'Gateway unavailable, approving user {user_id} from FSM data')
+            payment = PaymentRecord.from_dict(
+                {'until': s_data['due_to'], 'is_active': s_data.get('is_active')}, user_id
+            )
+
+        due_to = payment.until if payment else None
+        is_active = payment.is_active if payment else False
+
+        # При передаче FSM обновляет состояние памяти с новым due_to
+        if state: await state.update_data(due_to=due_to, is_active=is_active)
 
-        gateway = await get_gateway()
-        async with gateway:
-            # Отправляет запрос в GateWay -> dict[]
-            data = await gateway.get('payment_data', user_id)
-            # Извлекает данные из ответа и конвертирует
-            due_to = data.get('until') if data else None
-            is_active = True if data and str(data.get('is_active', False)).lower() == 'true' else False
-
-            # При передаче FSM обновляет состояние памяти с новым due_to
-            if state: await state.update_data(due_to=due_to, is_active=is_active)
-
-            if not due_to: return True # Пользователь еще не зарегистрирован
-
-            # При подходящем статусе ответа выполняет проверки:
-            if due_to:
-                # Переводит строку в объект datetime
-                due_date = datetime.fromisoformat(due_to)
-                # Приводим к naive datetime если нужно
-                if due_date.tzinfo is not None:
-                    due_date = due_date.replace(tzinfo=None)
-
-                # Наконец сверяет время пользователя из БД с текущим,
-                # чтобы определить, может ли пользователь продолжать
-                # пользоваться функциями бота
-                if due_date > get_current_datetime():
-                    # Подтверждает, что
-                    # пользовательское время не просрочено
-                    return True
-
-            # Проверка провалена
-            return False
+        # Наконец сверяет время пользователя из БД с текущим,
+        # чтобы определить, может ли пользователь продолжать
+        # пользоваться функциями бота (дата уже разобрана при декодировании)
+        return Entitlement.from_payment(payment, get_current_datetime())
 
     except Exception as e:
         logger.warning(f'Error approving user {user_id}: {e}')
-        return False
\ No newline at end of file
+        return Entitlement.denied()
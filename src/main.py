@@ -1,4 +1,5 @@
 import asyncio
+import time
 from datetime import timedelta
 from typing import Optional
 
@@ -6,13 +7,19 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums.parse_mode import ParseMode
 from aiogram.fsm.storage.redis import RedisStorage
-from dependencies import get_redis
+from dependencies import get_redis, get_gateway, get_profile_writer, get_outbox, get_invalidation_bus
 
 from src.config import config
 from src.logconf import opt_logger as log
+from src.middlewares.deadline_middleware import DeadlineMiddleware
+from src.middlewares.entitlement_middleware import EntitlementMiddleware
+from src.middlewares.prefetch_middleware import PrefetchMiddleware
 from src.middlewares.quiz_middleware import QuizMiddleware
 from src.middlewares.rate_limit_middleware import RateLimitMiddleware
 from src.routers import router as main_router
+from src.utils.access_data import data_storage
+from src.utils.metrics import PrometheusFileExporter
+from src.utils.readiness import mark_ready, mark_not_ready
 
 logger = log.setup_logger("main")
 
@@ -29,6 +36,39 @@ async def init_resources() -> None:
     quiz_middleware = QuizMiddleware()
 
 
+async def warm_up(bot: Bot, gateway, redis) -> None:
+    """
+    Открывает и проверяет соединения до начала polling: сессию Telegram API,
+    пул Redis и keep-alive соединения к Gateway - параллельно.
+    Без Telegram и Redis бот работать не может; Gateway ждем warmup_timeout,
+    дальше - либо стартуем с холодным пулом (start_without_gateway),
+    либо продолжаем ждать: бот не готов, пока пул не прогрет
+    """
+    started = time.perf_counter()
+
+    async def try_gateway():
+        while True:
+            try:
+                return await gateway.warm_up()
+            except Exception as e:
+                logger.warning(f"Gateway warm-up failed, retrying: {e!r}")
+                await asyncio.sleep(1.0)
+
+    async def warm_gateway():
+        try:
+            async with asyncio.timeout(config.bot.warmup_timeout):
+                return await try_gateway()
+        except TimeoutError:
+            if config.bot.start_without_gateway:
+                logger.error("Gateway is unreachable, starting with a cold pool (START_WITHOUT_GATEWAY)")
+                return
+            logger.error("Gateway is unreachable, staying not ready until it answers")
+        return await try_gateway()
+
+    me, _, _ = await asyncio.gather(bot.get_me(), redis.warm_up(), warm_gateway())
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s as @{me.username}")
+
+
 # noinspection PyUnresolvedReferences
 async def run():
     """Запуск бота и веб-сервера в одном event loop"""
@@ -41,13 +81,41 @@ async def run():
         )
     )
 
+    # Один пул соединений к Gateway на все время работы
+    gateway = await get_gateway()
+    gateway.connect()
+
+    # Периодический экспорт метрик Gateway
+    metrics_task: Optional[asyncio.Task] = None
+    if config.gateway.metrics_file:
+        gateway.metrics.add_exporter(PrometheusFileExporter(config.gateway.metrics_file, prefix='tg_bot_'))
+        metrics_task = asyncio.create_task(
+            gateway.metrics.run_export_loop(config.gateway.metrics_export_interval)
+        )
+
     redis = await get_redis()
+
+    # Фоновая доставка записей в Gateway из outbox
+    outbox = await get_outbox()
+    outbox.start()
     storage = RedisStorage(
         await redis.get_redis_client(),
         state_ttl=timedelta(minutes=10),
         data_ttl=timedelta(minutes=60)
     )
 
+    # Соединения открываются до первых апдейтов, а не под их нагрузкой
+    await warm_up(bot, gateway, redis)
+
+    # Изменения данных пользователей в других сервисах сбрасывают кэш Gateway и FSM.
+    # После своих записей FSM уже актуален - сбрасываем только по чужим сообщениям
+    invalidation_bus = await get_invalidation_bus()
+    invalidation_bus.add_handler(
+        lambda user_id, _: data_storage.evict_user(storage, bot.id, user_id),
+        remote_only=True,
+    )
+    invalidation_bus.start()
+
     # Инициализация диспетчера
     disp = Dispatcher(storage=storage)
 
@@ -59,17 +127,36 @@ async def run():
     disp.message.middleware(rate_limit_middleware)
     # Callbacks
     disp.callback_query.middleware(quiz_middleware)
+    # Дедлайн запросов к Gateway (включая фильтры) - пока Telegram ждет ответа на callback
+    disp.callback_query.outer_middleware(DeadlineMiddleware(config.bot.callback_deadline))
+    # Загрузка данных пользователя параллельно с FSM и фильтрами (наследует дедлайн)
+    if config.bot.prefetch_user_context:
+        prefetch_middleware = PrefetchMiddleware(gateway)
+        disp.message.outer_middleware(prefetch_middleware)
+        disp.callback_query.outer_middleware(prefetch_middleware)
+    # Доступ пользователя вычисляется один раз на апдейт (после предзагрузки)
+    entitlement_middleware = EntitlementMiddleware()
+    disp.message.outer_middleware(entitlement_middleware)
+    disp.callback_query.outer_middleware(entitlement_middleware)
 
     # Добавление роутеров
     disp.include_router(main_router)
 
     try:
         logger.info("Starting main tg-src-service (polling)…")
+        mark_ready(config.bot.ready_file)
         await disp.start_polling(bot)
 
     finally:
         # Корректное завершение
+        mark_not_ready(config.bot.ready_file)
         await bot.close()
+        if metrics_task: metrics_task.cancel()
+        # Дописываем отложенные изменения профилей, пока пул еще открыт
+        await (await get_profile_writer()).close()
+        await outbox.close()
+        await invalidation_bus.close()
+        await gateway.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.utils.deadline import deadline
+
+
+class DeadlineMiddleware(BaseMiddleware):
+    """
+    Задает дедлайн обработки апдейта: запросы к Gateway,
+    которые уже не успеют до его истечения (например, до закрытия
+    окна ответа на callback), прерываются вместо ожидания.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        with deadline(self.timeout):
+            return await handler(event, data)
@@ -0,0 +1,26 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.filters.approved import resolve_entitlement
+
+
+class EntitlementMiddleware(BaseMiddleware):
+    """
+    Вычисляет доступ пользователя (Entitlement) один раз на апдейт и
+    кладет его в data['entitlement']: фильтры approved и обработчики
+    берут готовый результат, сколько бы проверок ни выполнялось.
+    Регистрируется после PrefetchMiddleware, чтобы дождаться предзагрузки
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is not None and not user.is_bot:
+            data['entitlement'] = await resolve_entitlement(user.id, data.get('state'))
+        return await handler(event, data)
@@ -0,0 +1,40 @@
+from typing import Any, Awaitable, Callable, TYPE_CHECKING
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.utils.prefetch import prefetch, forget
+
+if TYPE_CHECKING:
+    from src.services.gateway import GatewayService
+
+
+class PrefetchMiddleware(BaseMiddleware):
+    """
+    Сразу при получении апдейта, до фильтров и роутеров, запускает
+    загрузку данных пользователя (UserBundle). approved, DataStorage и
+    обработчики дожидаются уже идущего запроса, а задержка Gateway
+    перекрывается загрузкой FSM из Redis и проверкой фильтров.
+    """
+
+    def __init__(self, gateway: "GatewayService"):
+        self.gateway = gateway
+        # После записи в Gateway предзагруженные данные устарели
+        gateway.cache.add_listener(self._forget)
+
+    @staticmethod
+    async def _forget(user_id: int, _methods) -> None:
+        forget(user_id)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is None or user.is_bot:
+            return await handler(event, data)
+
+        with prefetch(user.id, self.gateway.get_user_bundle(user.id)):
+            return await handler(event, data)
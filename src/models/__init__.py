@@ -1,7 +1,13 @@
 __all__ = [
     'User',
     'Payment',
-    'Profile'
+    'Profile',
+    'UserRecord',
+    'ProfileRecord',
+    'PaymentRecord',
+    'UserBundle',
+    'Entitlement',
 ]
 
-from .bot_models import User, Payment, Profile
\ No newline at end of file
+from .bot_models import User, Payment, Profile
+from .records import UserRecord, ProfileRecord, PaymentRecord, UserBundle, Entitlement
@@ -0,0 +1,193 @@
+from dataclasses import dataclass
+from datetime import datetime, date
+from typing import Optional, Self
+
+from src.utils.timer import get_current_datetime
+
+
+def _as_bool(value) -> bool:
+    """ Gateway отдает флаги и как bool, и как строки 'true'/'false' """
+    return str(value).lower() == 'true'
+
+
+def _naive(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+@dataclass(slots=True)
+class UserRecord:
+    """ Ответ Gateway: /api/users?target_field=users """
+
+    user_id: Optional[int]
+    username: Optional[str]
+    camefrom: str
+    first_name: str
+    language: str
+    fluency: int
+    topics: list[str]
+    lang_code: str
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict], user_id: int = None) -> Optional[Self]:
+        if not data:
+            return None
+        return cls(
+            user_id=data.get('user_id', user_id),
+            username=data.get('username'),
+            camefrom=data.get('camefrom'),
+            first_name=data.get('first_name'),
+            language=data.get('language'),
+            fluency=data.get('fluency'),
+            topics=data.get('topics') or [],
+            lang_code=data.get('lang_code'),
+        )
+
+
+@dataclass(slots=True)
+class ProfileRecord:
+    """ Ответ Gateway: /api/users?target_field=profiles """
+
+    user_id: Optional[int]
+    nickname: str
+    email: str
+    gender: str
+    intro: str
+    birthday: str                       # Как пришло от Gateway (для FSM)
+    birth_date: Optional[datetime]      # Разобранная дата рождения
+    dating: bool
+    status: str
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict], user_id: int = None) -> Optional[Self]:
+        if not data or data.get('error', False):
+            return None
+        birthday = data.get('birthday')
+        return cls(
+            user_id=data.get('user_id', user_id),
+            nickname=data.get('nickname'),
+            email=data.get('email'),
+            gender=data.get('gender'),
+            intro=data.get('intro'),
+            birthday=birthday,
+            birth_date=_naive(birthday) if isinstance(birthday, str) else birthday,
+            dating=data.get('dating'),
+            status=data.get('status'),
+        )
+
+    @property
+    def age(self) -> Optional[int]:
+        if self.birth_date is None:
+            return None
+        birth_date = self.birth_date
+        if not isinstance(birth_date, datetime) and isinstance(birth_date, date):
+            birth_date = datetime.combine(birth_date, datetime.min.time())
+        return (get_current_datetime() - birth_date).days // 365
+
+
+@dataclass(slots=True)
+class PaymentRecord:
+    """ Ответ Gateway: /api/payment_data """
+
+    user_id: Optional[int]
+    is_active: bool
+    until: Optional[str]                # Как пришло от Gateway (для FSM)
+    due_date: Optional[datetime]        # until в виде naive datetime
+    period: Optional[str] = None
+    trial: Optional[bool] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict], user_id: int = None) -> Optional[Self]:
+        if not data:
+            return None
+        until = data.get('until')
+        return cls(
+            user_id=data.get('user_id', user_id),
+            is_active=_as_bool(data.get('is_active', False)),
+            until=until,
+            due_date=_naive(until),
+            period=data.get('period'),
+            trial=data.get('trial'),
+        )
+
+    def is_paid(self, now: Optional[datetime] = None) -> bool:
+        """ Оплаченный период еще не истек """
+        if self.due_date is None:
+            return False
+        return self.due_date > (now or get_current_datetime())
+
+
+@dataclass(slots=True, frozen=True)
+class Entitlement:
+    """ Доступ пользователя к функциям бота: вычисляется один раз на апдейт """
+
+    registered: bool                    # Есть платежная запись (аккаунт создан)
+    active: bool                        # Оплаченный период не истек
+    due_date: Optional[datetime]
+    until: Optional[str]                # Как пришло от Gateway (для FSM и подписей)
+    paused: bool = False                # Продление подписки отключено пользователем
+
+    @classmethod
+    def from_payment(cls, payment: Optional[PaymentRecord], now: Optional[datetime] = None) -> Self:
+        if payment is None or not payment.until:
+            return cls(registered=False, active=False, due_date=None, until=None)
+        return cls(
+            registered=True,
+            active=payment.is_paid(now),
+            due_date=payment.due_date,
+            until=payment.until,
+            paused=not payment.is_active,
+        )
+
+    @classmethod
+    def denied(cls) -> Self:
+        """ Данные подписки получить не удалось """
+        return cls(registered=True, active=False, due_date=None, until=None)
+
+    @property
+    def allowed(self) -> bool:
+        """ Проходит approved: незарегистрированных не останавливаем """
+        return not self.registered or self.active
+
+
+@dataclass(slots=True)
+class UserBundle:
+    """ Все данные пользователя, нужные DataStorage """
+
+    user: UserRecord
+    payment: Optional[PaymentRecord]
+    profile: Optional[ProfileRecord]
+
+    def to_storage(self) -> dict:
+        """ Плоский словарь для FSM (формат DataStorage.set_user_info) """
+        user, payment, profile = self.user, self.payment, self.profile
+        result = {
+            "user_id": user.user_id,
+            "username": user.username,
+            "first_name": user.first_name,
+            "language": user.language,
+            "fluency": user.fluency,
+            "topics": ', '.join(user.topics),
+            "camefrom": user.camefrom,
+            "lang_code": user.lang_code,
+            "is_active": payment.is_active if payment else False,
+            "due_to": payment.until if payment else None,
+        }
+
+        if profile is not None:
+            result.update(
+                {
+                    "birthday": profile.birthday,
+                    "nickname": profile.nickname,
+                    "email": profile.email,
+                    "gender": profile.gender,
+                    "dating": profile.dating,
+                    "intro": profile.intro,
+                    "status": profile.status,
+                    "age": profile.age,
+                }
+            )
+
+        return result
@@ -4,7 +4,7 @@ from aiogram.filters import and_f
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
-from src.dependencies import get_gateway
+from src.dependencies import get_profile_writer
 from src.exc import StorageDataException
 from src.filters.approved import approved
 from src.keyboards.inline_keyboards import (
@@ -152,29 +152,27 @@ async def change_fluency_handler(callback: CallbackQuery, state: FSMContext):
 
     user_id = callback.from_user.id
     try:
-        gateway = await get_gateway()
-        async with gateway:
-            data = await ds.get_storage_data(user_id, state)
-            new_language = data.get("new_language")
-            users_choice = int(callback.data.split('_', 1)[1])
-            # Возвращает всю информацию о пользователе
-            data = await ds.get_storage_data(user_id, state)
-            topics = data.get('topics')
-            new_topics = topics.split(', ') if ', ' in topics else list(topics)
-            new_user = User(
-                user_id=user_id,
-                username=data.get('username'),
-                camefrom=data.get('camefrom'),
-                first_name=data.get('first_name'),
-                language=new_language,
-                fluency=users_choice,
-                topics=new_topics,
-                lang_code=data.get('lang_code')
-            )
-            await gateway.put(
-                'update_profile',new_data=new_user
-            )
-            await state.update_data(language=new_language, fluency=users_choice)
+        writer = await get_profile_writer()
+        data = await ds.get_storage_data(user_id, state)
+        new_language = data.get("new_language")
+        users_choice = int(callback.data.split('_', 1)[1])
+        # Возвращает всю информацию о пользователе
+        data = await ds.get_storage_data(user_id, state)
+        topics = data.get('topics')
+        new_topics = topics.split(', ') if ', ' in topics else list(topics)
+        new_user = User(
+            user_id=user_id,
+            username=data.get('username'),
+            camefrom=data.get('camefrom'),
+            first_name=data.get('first_name'),
+            language=new_language,
+            fluency=users_choice,
+            topics=new_topics,
+            lang_code=data.get('lang_code')
+        )
+        # Запись склеивается с соседними изменениями профиля
+        await writer.update(new_user)
+        await state.update_data(language=new_language, fluency=users_choice)
 
         await state.set_state(MultiSelection.ended_change)
         return await go_back_handler(callback, state)
@@ -197,7 +195,7 @@ async def change_topic_handler(callback: CallbackQuery, state: FSMContext):
     # database = await get_db()
     user_id = callback.from_user.id
     users_choice = callback.data.split("_")[1]
-    gateway = await get_gateway()
+    writer = await get_profile_writer()
 
     try:
         data = await state.get_data()
@@ -226,10 +224,7 @@ async def change_topic_handler(callback: CallbackQuery, state: FSMContext):
                     lang_code=data.get('lang_code')
                 )
 
-                async with gateway:
-                    await gateway.put(
-                        'update_profile', new_data=new_user
-                    )
+                await writer.update(new_user)
 
                 await callback.answer(MESSAGES["topic_changed"][lang_code])
                 await state.update_data(new_topics=[], topics=", ".join(new_topics))
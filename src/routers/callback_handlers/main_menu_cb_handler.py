@@ -5,7 +5,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, FSInputFile
 
 from src.config import config
-from src.dependencies import get_gateway
+from src.dependencies import get_outbox
 from src.exc import StorageDataException
 from src.filters.approved import approved
 from src.keyboards.inline_keyboards import (
@@ -16,6 +16,7 @@ from src.keyboards.inline_keyboards import (
     about_me_keyboard
 )
 from src.logconf import opt_logger as log
+from src.models import Entitlement
 from src.translations import MESSAGES, EMOJI_SHOP, TRANSCRIPTIONS, EMOJI_TRANSCRIPTIONS
 from src.utils.access_data import data_storage as ds, MultiSelection
 
@@ -201,21 +202,17 @@ async def shop_handler(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "sub_details")
-async def manage_subscription_handler(callback: CallbackQuery, state: FSMContext):
+async def manage_subscription_handler(callback: CallbackQuery, state: FSMContext, entitlement: Entitlement):
 
     await callback.answer()
     user_id = callback.from_user.id
+    data = await ds.get_storage_data(user_id, state)
+    lang_code = data.get("lang_code")
 
-    if await approved(callback, state):
-
-        # После обновления Storage, делаю проверку на статус
-        data = await ds.get_storage_data(user_id, state)
-        lang_code = data.get("lang_code")
-        is_active = data.get("is_active")
-        due_to = data.get('due_to')
+    if entitlement.allowed:
 
-        if is_active:
-            cap = MESSAGES["active_sub_caption"][lang_code].format(date=due_to.split('T')[0])
+        if entitlement.active and not entitlement.paused:
+            cap = MESSAGES["active_sub_caption"][lang_code].format(date=entitlement.until.split('T')[0])
             await callback.message.edit_caption(
                 caption=cap,
                 reply_markup=get_subscription_keyboard(lang_code, True),
@@ -229,9 +226,6 @@ async def manage_subscription_handler(callback: CallbackQuery, state: FSMContext
                 parse_mode=ParseMode.HTML
             )
     else:
-        # Уже по новой вызывается ds, чтобы вытащить lang_code
-        data = await ds.get_storage_data(user_id, state)
-        lang_code = data.get("lang_code")
         cap = MESSAGES["expired_sub_caption"][lang_code]
         await callback.message.edit_caption(
             caption=cap,
@@ -241,21 +235,23 @@ async def manage_subscription_handler(callback: CallbackQuery, state: FSMContext
 
 
 @router.callback_query(F.data == "cancel_subscription")
-async def cancel_subscription_handler(callback: CallbackQuery, state: FSMContext):
+async def cancel_subscription_handler(callback: CallbackQuery, state: FSMContext, entitlement: Entitlement):
 
     await callback.answer("Subscription cancelled")
 
     user_id = callback.from_user.id
 
-    gateway = await get_gateway()
-    async with gateway:
-        await gateway.post('deactivate_subscription', user_id)
+    outbox = await get_outbox()
+    await outbox.enqueue('deactivate_subscription', user_id)
 
     user_id = callback.from_user.id
     data = await ds.get_storage_data(user_id, state, True)
+    # Gateway получит запись из outbox чуть позже
+    await state.update_data(is_active=False)
     lang_code = data.get("lang_code")
 
-    if await approved(callback):
+    # Отмена продления не меняет оплаченный период
+    if entitlement.allowed:
 
         cap = MESSAGES["resume_sub_caption"][lang_code]
         await callback.message.edit_caption(
@@ -274,25 +270,24 @@ async def cancel_subscription_handler(callback: CallbackQuery, state: FSMContext
 
 
 @router.callback_query(F.data == "resume_subscription")
-async def resume_subscription_handler(callback: CallbackQuery, state: FSMContext):
+async def resume_subscription_handler(callback: CallbackQuery, state: FSMContext, entitlement: Entitlement):
 
     await callback.answer("Subscription resumed")
     user_id = callback.from_user.id
 
     try:
         # Отправляет запрос на микросервис оплаты
-        gateway = await get_gateway()
-        async with gateway:
-            await gateway.post('activate_subscription', user_id)
-
+        outbox = await get_outbox()
+        await outbox.enqueue('activate_subscription', user_id)
 
         user_id = callback.from_user.id
         data = await ds.get_storage_data(user_id, state, True)
+        # Gateway получит запись из outbox чуть позже
+        await state.update_data(is_active=True)
         lang_code = data.get("lang_code")
-        due_to = data.get('due_to')
 
-        if await approved(callback):
-            cap = MESSAGES["active_sub_caption"][lang_code].format(date=due_to.split('T')[0])
+        if entitlement.active:
+            cap = MESSAGES["active_sub_caption"][lang_code].format(date=entitlement.until.split('T')[0])
             await callback.message.edit_caption(
                 caption=cap,
                 reply_markup=get_subscription_keyboard(lang_code, True),
@@ -6,7 +6,7 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery, FSInputFile
 
 from src.config import config
-from src.dependencies import get_gateway
+from src.dependencies import get_outbox
 from src.keyboards.inline_keyboards import (
     show_language_keyboard,
     show_fluency_keyboard,
@@ -152,7 +152,7 @@ async def go_to_main_menu(callback: CallbackQuery, state: FSMContext):
 
     await callback.answer()
     await callback.message.delete()
-    gateway = await get_gateway()
+    outbox = await get_outbox()
     data = await state.get_data()
 
     lang_code = data.get("lang_code")
@@ -169,19 +169,19 @@ async def go_to_main_menu(callback: CallbackQuery, state: FSMContext):
         reply_markup=get_on_main_menu_keyboard(lang_code),
         parse_mode=ParseMode.HTML,
     )
-    # Отправляем нового пользователя на БД сервер
-    async with gateway:
-        await gateway.post(
-            'add_user',
-            user_data = User(
-                user_id=int(data.get("user_id")),
-                username=data.get("username"),
-                first_name=data.get("first_name"),
-                camefrom=data.get("camefrom"),
-                language=data.get("language"),
-                fluency=int(data.get("fluency")),
-                topics=data.get("topics"),
-                lang_code=lang_code,
-            )
+    # Отправляем нового пользователя на БД сервер через outbox:
+    # запись переживет сбой Gateway и не задерживает ответ
+    await outbox.enqueue(
+        'add_user',
+        user_data = User(
+            user_id=int(data.get("user_id")),
+            username=data.get("username"),
+            first_name=data.get("first_name"),
+            camefrom=data.get("camefrom"),
+            language=data.get("language"),
+            fluency=int(data.get("fluency")),
+            topics=data.get("topics"),
+            lang_code=lang_code,
         )
+    )
 
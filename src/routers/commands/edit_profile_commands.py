@@ -4,7 +4,7 @@ from aiogram.filters import and_f
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
-from src.dependencies import get_gateway
+from src.dependencies import get_profile_writer
 from src.exc import AlreadyExistsError, TooShortError, TooLongError, InvalidCharactersError, EmptySpaceError, \
     EmojiesNotAllowed
 from src.filters.approved import approved
@@ -53,8 +53,8 @@ async def edit_nickname_handler(message: Message, state: FSMContext) -> None:
             parse_mode=ParseMode.HTML
         )
 
-        gateway = await get_gateway()
-        user_data = ds.get_storage_data(user_id, state)
+        writer = await get_profile_writer()
+        user_data = await ds.get_storage_data(user_id, state)
         new_profile = Profile(
             user_id=user_id,
             nickname=new_nickname,
@@ -66,11 +66,8 @@ async def edit_nickname_handler(message: Message, state: FSMContext) -> None:
             status=user_data.get('status'),
         )
 
-        async with gateway:
-            await gateway.put(
-                'update_profile',
-                new_profile
-            )
+        # Уникальность никнейма проверяет Gateway - пишем сразу
+        await writer.update(new_profile, flush=True)
 
         return await state.set_state(MultiSelection.ended_change)
 
@@ -94,7 +91,7 @@ async def edit_intro_handler(message: Message, state: FSMContext):
             parse_mode=ParseMode.HTML
         )
 
-        gateway = await get_gateway()
+        writer = await get_profile_writer()
         new_profile = Profile(
             user_id=user_id,
             intro=new_intro,
@@ -105,11 +102,7 @@ async def edit_intro_handler(message: Message, state: FSMContext):
             status=data.get('status'),
             birthday=data.get('birthday')
         )
-        async with gateway:
-            await gateway.put(
-                'update_profile',
-                new_profile
-            )
+        await writer.update(new_profile)
 
         return await state.set_state(MultiSelection.ended_change)
 
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from src.config import config, GatewayConfig
+from src.models import PaymentRecord
+from src.services.gateway import GatewayService, gateway_service
+from src.services.gateway_cache import MISS
+from src.services.invalidation import InvalidationBus, invalidation_bus
+from src.utils.lru_cache import TTLCache
+from src.utils.timer import get_current_datetime
+
+
+@dataclass
+class EntitlementStats:
+    """ Счетчики кэша подписки """
+
+    hits: int = 0
+    misses: int = 0
+    invalidated: int = 0
+
+
+class EntitlementCache:
+    """
+    Локальный кэш платежных данных (until / is_active) для фильтра approved.
+
+    Ответ approved меняется только в момент истечения подписки или
+    по событию оплаты / переключения подписки. Поэтому запись живет
+    до due_date (но не дольше страховочного TTL), а события сбрасывают
+    ее: свои записи - через слушатель кэша Gateway, чужие (другие
+    инстансы, сервис оплаты) - через шину инвалидации
+    """
+
+    def __init__(
+        self,
+        gateway: GatewayService,
+        bus: Optional[InvalidationBus] = None,
+        settings: Optional["GatewayConfig"] = None,
+    ):
+        self.settings = settings or config.gateway
+        self._entries = TTLCache(
+            maxsize=self.settings.entitlement_cache_size, ttl=self.settings.entitlement_safety_ttl
+        )
+        self.stats = EntitlementStats()
+        gateway.cache.add_listener(self.invalidate)
+        if bus is not None:
+            bus.add_handler(self.invalidate)
+
+    def get(self, user_id: int) -> Any:
+        """ PaymentRecord (или None - не зарегистрирован) либо MISS """
+        payment = self._entries.get(user_id, MISS)
+        if payment is MISS:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return payment
+
+    def set(self, user_id: int, payment: Optional[PaymentRecord]) -> None:
+        ttl = self.settings.entitlement_safety_ttl
+        if payment is not None and payment.due_date is not None:
+            left = (payment.due_date - get_current_datetime()).total_seconds()
+            # Оплаченная подписка перестанет проходить approved ровно в due_date;
+            # истекшую изменит только оплата, о ней придет событие
+            if left > 0:
+                ttl = min(ttl, left)
+        self._entries.set(user_id, payment, ttl=ttl)
+
+    async def invalidate(self, user_id: int, methods: Iterable[str]) -> None:
+        """ Сбрасывает запись, если изменились платежные данные пользователя """
+        if 'payment_data' not in methods:
+            return
+        size = len(self._entries)
+        self._entries.delete(user_id)
+        self.stats.invalidated += size - len(self._entries)
+
+
+entitlement_cache = EntitlementCache(gateway_service, invalidation_bus)
@@ -0,0 +1,298 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from src.config import config, GatewayConfig
+from src.logconf import opt_logger as log
+from src.services.redis import redis_service
+from src.utils import json_codec
+from src.utils.lru_cache import TTLCache
+
+logger = log.setup_logger('gateway cache')
+
+# Маркер промаха: None - допустимый ответ Gateway
+MISS = object()
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """ Политика кэширования для GET метода Gateway """
+
+    ttl: float          # Время жизни записи, сек.
+    maxsize: int        # Максимум записей в памяти процесса
+
+
+@dataclass(frozen=True, slots=True)
+class Validators:
+    """ Валидаторы ответа для условного GET (ETag / Last-Modified) """
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """ Запись кэша вместе со свежестью и валидаторами """
+
+    value: Any
+    fresh: bool
+    validators: Validators
+
+
+def extract_user_id(*args, **kwargs) -> Optional[int]:
+    """ Находит user_id среди аргументов вызова Gateway """
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        user_id = getattr(value, 'user_id', None)
+        if user_id is not None:
+            return int(user_id)
+    return None
+
+
+class GatewayCache:
+    """
+    Двухуровневый read-through кэш ответов Gateway:
+    сначала LRU в памяти процесса, затем Redis (общий для всех инстансов).
+
+    Ключи сгруппированы по (method, user_id): в Redis это hash
+    gw:{method}:{user_id}, поле которого - остальные аргументы вызова.
+    Так запись одним DEL удаляет все варианты (e.g. user_data users/profiles).
+    Вместе с ответом хранятся его ETag / Last-Modified: просроченную
+    запись можно перепроверить условным GET вместо полной загрузки.
+    """
+
+    prefix = 'gw'
+
+    def __init__(
+        self,
+        policies: dict[str, CachePolicy],
+        invalidates: dict[str, tuple[str, ...]],
+        settings: Optional["GatewayConfig"] = None,
+    ):
+        self.settings = settings or config.gateway
+        self.invalidates = invalidates
+        self.policies: dict[str, CachePolicy] = {}
+
+        # Политики из реестра эндпоинтов, TTL и размер можно переопределить в конфиге
+        for method, policy in policies.items():
+            self.policies[method] = CachePolicy(
+                ttl=self.settings.cache_ttls.get(method, policy.ttl),
+                maxsize=int(self.settings.cache_sizes.get(method, policy.maxsize)),
+            )
+
+        self._local: dict[str, TTLCache] = {
+            method: TTLCache(maxsize=policy.maxsize, ttl=policy.ttl)
+            for method, policy in self.policies.items()
+        }
+        # Валидаторы живут столько же, сколько устаревшая запись
+        self._validators: dict[str, TTLCache] = {
+            method: TTLCache(maxsize=policy.maxsize, ttl=policy.ttl + self.settings.stale_ttl)
+            for method, policy in self.policies.items()
+        }
+
+        # Вызываются после инвалидации по записи (e.g. рассылка другим инстансам)
+        self._listeners: list[Callable[[int, tuple[str, ...]], Awaitable[None]]] = []
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.cache_enabled
+
+    def is_cached(self, method_name: str) -> bool:
+        return self.enabled and method_name in self.policies
+
+    @staticmethod
+    def _field(args: tuple, kwargs: dict) -> str:
+        """ Все аргументы кроме user_id -> поле в hash """
+        parts = [str(a) for a in args[1:]]
+        parts += [f'{k}={v}' for k, v in sorted(kwargs.items())]
+        return ':'.join(parts)
+
+    def _redis_key(self, method_name: str, user_id: Any) -> str:
+        return f'{self.prefix}:{method_name}:{user_id}'
+
+    @staticmethod
+    async def _client():
+        return await redis_service.get_redis_client()
+
+    def get_local(self, method_name: str, *args, **kwargs) -> Any:
+        """ Быстрый путь: только память процесса (без await) """
+        value = self._local[method_name].get((args, tuple(sorted(kwargs.items()))), MISS)
+        if value is not MISS:
+            self.hits += 1
+        return value
+
+    async def get_remote(self, method_name: str, *args, **kwargs) -> Any:
+        """ Второй уровень: Redis. При попадании прогревает локальный кэш """
+        user_id, field = args[0], self._field(args, kwargs)
+        try:
+            client = await self._client()
+            raw = await client.hget(self._redis_key(method_name, user_id), field)
+        except Exception as e:
+            logger.warning(f'Redis cache read failed for {method_name}: {e}')
+            self.misses += 1
+            return MISS
+
+        if raw is None:
+            self.misses += 1
+            return MISS
+
+        entry = json_codec.loads(raw)
+        remaining = entry['exp'] - time.time()
+        if remaining <= 0:
+            self.misses += 1
+            return MISS
+
+        self.redis_hits += 1
+        self._set_local(method_name, args, kwargs, entry['v'], ttl=remaining)
+        return entry['v']
+
+    async def get_stale(self, method_name: str, *args, **kwargs) -> Any:
+        """ Просроченная запись (в пределах stale_ttl) - если Gateway недоступен """
+        if not self.is_cached(method_name):
+            return MISS
+
+        max_stale = self.settings.stale_ttl
+        value = self._local[method_name].get_stale(
+            (args, tuple(sorted(kwargs.items()))), max_stale, MISS
+        )
+        if value is not MISS:
+            return value
+
+        try:
+            client = await self._client()
+            raw = await client.hget(self._redis_key(method_name, args[0]), self._field(args, kwargs))
+        except Exception as e:
+            logger.warning(f'Redis stale read failed for {method_name}: {e}')
+            return MISS
+
+        if raw is None:
+            return MISS
+        entry = json_codec.loads(raw)
+        if time.time() - entry['exp'] > max_stale:
+            return MISS
+        return entry['v']
+
+    async def get_entry(self, method_name: str, *args, **kwargs) -> Optional[CacheEntry]:
+        """
+        Запись для условного GET: свежая (прогревает локальный кэш)
+        или устаревшая с валидаторами - из Redis, иначе из памяти процесса
+        """
+        key = (args, tuple(sorted(kwargs.items())))
+        max_stale = self.settings.stale_ttl
+        try:
+            client = await self._client()
+            raw = await client.hget(self._redis_key(method_name, args[0]), self._field(args, kwargs))
+        except Exception as e:
+            logger.warning(f'Redis cache read failed for {method_name}: {e}')
+            raw = None
+
+        if raw is not None:
+            entry = json_codec.loads(raw)
+            validators = Validators(entry.get('etag'), entry.get('lm'))
+            remaining = entry['exp'] - time.time()
+            if remaining > 0:
+                self.redis_hits += 1
+                self._set_local(method_name, args, kwargs, entry['v'], ttl=remaining, validators=validators)
+                return CacheEntry(entry['v'], True, validators)
+
+            self.misses += 1
+            if -remaining <= max_stale:
+                return CacheEntry(entry['v'], False, validators)
+            return None
+
+        self.misses += 1
+        value = self._local[method_name].get_stale(key, max_stale, MISS)
+        validators = self._validators[method_name].get(key)
+        if value is MISS or not validators:
+            return None
+        return CacheEntry(value, False, validators)
+
+    def _set_local(
+        self, method_name: str, args: tuple, kwargs: dict, value: Any,
+        ttl: float = None, validators: Optional[Validators] = None
+    ):
+        key = (args, tuple(sorted(kwargs.items())))
+        self._local[method_name].set(key, value, group=args[0], ttl=ttl)
+        if validators:
+            self._validators[method_name].set(key, validators, group=args[0])
+        else:
+            # Старые валидаторы к новому значению не относятся
+            self._validators[method_name].delete(key)
+
+    def apply_local(self, method_name: str, value: Any, *args, **kwargs) -> None:
+        """ Подменяет запись только в памяти процесса (e.g. до отложенной записи) """
+        if self.is_cached(method_name):
+            self._set_local(method_name, args, kwargs, value)
+
+    async def set(
+        self, method_name: str, value: Any, *args,
+        validators: Optional[Validators] = None, **kwargs
+    ) -> None:
+        policy = self.policies[method_name]
+        self._set_local(method_name, args, kwargs, value, validators=validators)
+
+        key = self._redis_key(method_name, args[0])
+        payload = {'v': value, 'exp': time.time() + policy.ttl}
+        if validators:
+            payload['etag'], payload['lm'] = validators.etag, validators.last_modified
+        entry = json_codec.dumps(payload)
+        try:
+            client = await self._client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, self._field(args, kwargs), entry)
+                # Запись живет дольше TTL, чтобы отдавать ее при сбоях Gateway
+                pipe.expire(key, int(policy.ttl + self.settings.stale_ttl) + 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f'Redis cache write failed for {method_name}: {e}')
+
+    async def invalidate(self, user_id: int, methods: tuple[str, ...]) -> None:
+        """ Удаляет записи пользователя для перечисленных методов """
+        keys = []
+        for method in methods:
+            if method not in self._local:
+                continue
+            self._local[method].delete_group(user_id)
+            self._validators[method].delete_group(user_id)
+            keys.append(self._redis_key(method, user_id))
+
+        if not keys or not self.enabled:
+            return
+        try:
+            client = await self._client()
+            await client.delete(*keys)
+        except Exception as e:
+            logger.warning(f'Redis cache invalidation failed for user {user_id}: {e}')
+
+    def add_listener(self, listener: Callable[[int, tuple[str, ...]], Awaitable[None]]) -> None:
+        self._listeners.append(listener)
+
+    async def invalidate_after(self, write_method: str, *args, **kwargs) -> None:
+        """ Инвалидация по имени POST/PUT метода """
+        methods = self.invalidates.get(write_method)
+        user_id = extract_user_id(*args, **kwargs)
+        if methods and user_id is not None:
+            await self.invalidate(user_id, methods)
+            for listener in self._listeners:
+                try:
+                    await listener(user_id, methods)
+                except Exception as e:
+                    logger.warning(f'Invalidation listener failed for user {user_id}: {e}')
+
@@ -0,0 +1,259 @@
+"""
+Декларативный реестр эндпоинтов Gateway.
+
+Каждый метод GatewayService (get/post/put + имя) описан одной записью:
+путь, HTTP метод, аргументы вызова и куда они попадают (query или тело),
+тип ответа, политика кэша, таймаут и идемпотентность. При импорте реестр
+компилируется в объекты EndpointCall, так что у всех запросов один общий
+путь исполнения вместо отдельного _get_*/_post_* метода на каждый эндпоинт.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+from fastapi import HTTPException
+
+from src.models import UserRecord, ProfileRecord, PaymentRecord
+from src.services.gateway_cache import CachePolicy, Validators
+from src.utils.json_codec import loads, dumps
+
+if TYPE_CHECKING:
+    from src.services.gateway import GatewayService
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """ Описание одного метода Gateway """
+
+    name: str                                   # Имя метода: gateway.get('<name>', ...)
+    method: str                                 # 'GET' | 'POST' | 'PUT'
+    path: str                                   # e.g. '/api/users'
+    args: tuple[str, ...] = ()                  # Аргументы вызова по порядку
+    query: dict[str, str] = field(default_factory=dict)     # аргумент -> query параметр
+    body: Optional[Callable[[dict], bytes | str]] = None    # аргументы -> тело запроса
+    response: Any = None                        # Тип записи ответа или {target: тип}
+    cache: Optional[CachePolicy] = None         # Политика кэша (только GET)
+    invalidates: tuple[str, ...] = ()           # Кэшируемые методы, устаревающие после записи
+    timeout: Optional[float] = None             # Таймаут чтения по умолчанию, сек.
+    idempotent: Optional[bool] = None           # Можно ли повторять (по умолчанию: GET/PUT)
+    bulk: bool = False                          # Поддерживает ?user_id=1&user_id=2...
+    decode: bool = True                         # Разбирать ли тело ответа
+    error_status: Optional[int] = None          # Статус HTTPException вместо ответного
+    conditional: bool = False                   # Поддерживает If-None-Match / If-Modified-Since
+    concurrency: Optional[int] = None           # Лимит одновременных запросов (bulkhead)
+
+    @property
+    def crud(self) -> str:
+        return self.method.lower()
+
+    @property
+    def is_idempotent(self) -> bool:
+        if self.idempotent is not None:
+            return self.idempotent
+        return self.method in ('GET', 'PUT')
+
+
+REGISTRY: tuple[Endpoint, ...] = (
+    # GET
+    Endpoint(
+        'check_user_exists', 'GET', '/api/users',
+        args=('user_id',), query={'user_id': 'user_id'},
+        cache=CachePolicy(ttl=600, maxsize=10_000), bulk=True,
+    ),
+    Endpoint(
+        'nickname_exists', 'GET', '/api/nicknames',
+        args=('nickname',), query={'nickname': 'nickname'},
+    ),
+    Endpoint(
+        'user_data', 'GET', '/api/users',
+        args=('user_id', 'target'), query={'user_id': 'user_id', 'target': 'target_field'},
+        response={'users': UserRecord, 'profiles': ProfileRecord},
+        cache=CachePolicy(ttl=300, maxsize=20_000), bulk=True, conditional=True,
+    ),
+    Endpoint(
+        'user_bundle', 'GET', '/api/user_bundle',
+        args=('user_id',), query={'user_id': 'user_id'},
+    ),
+    Endpoint(
+        'users_page', 'GET', '/api/users/page',
+        args=('after', 'limit', 'target'),
+        query={'after': 'after', 'limit': 'limit', 'target': 'target_field'},
+        timeout=10.0,
+    ),
+    Endpoint(
+        'payment_data', 'GET', '/api/payment_data',
+        args=('user_id',), query={'user_id': 'user_id'},
+        response=PaymentRecord,
+        cache=CachePolicy(ttl=60, maxsize=10_000), bulk=True, conditional=True,
+    ),
+    Endpoint(
+        'due_to', 'GET', '/api/due_to',
+        args=('user_id',), query={'user_id': 'user_id'},
+        cache=CachePolicy(ttl=60, maxsize=10_000),
+    ),
+    Endpoint(
+        'yookassa_link', 'GET', '/api/yookassa_link',
+        args=('user_id',), query={'user_id': 'user_id'},
+        cache=CachePolicy(ttl=120, maxsize=5_000), error_status=500,
+        # Медленный платежный провайдер не должен занимать весь пул
+        concurrency=8,
+    ),
+
+    # POST
+    Endpoint(
+        'add_user', 'POST', '/api/users',
+        args=('user_data',), body=lambda a: a['user_data'].model_dump_json(),
+        invalidates=('check_user_exists', 'user_data', 'payment_data', 'due_to'),
+        timeout=10.0, idempotent=True,
+    ),
+    Endpoint(
+        'activate_subscription', 'POST', '/api/toggle_sub',
+        args=('user_id',), body=lambda a: dumps({'user_id': a['user_id'], 'activate': True}),
+        invalidates=('payment_data', 'due_to'),
+        timeout=10.0, idempotent=True, decode=False,
+    ),
+    Endpoint(
+        'deactivate_subscription', 'POST', '/api/toggle_sub',
+        args=('user_id',), body=lambda a: dumps({'user_id': a['user_id'], 'activate': False}),
+        invalidates=('payment_data', 'due_to'),
+        timeout=10.0, idempotent=True, decode=False,
+    ),
+
+    # PUT
+    Endpoint(
+        'update_profile', 'PUT', '/api/update_profile',
+        args=('new_data',), body=lambda a: a['new_data'].model_dump_json(),
+        invalidates=('user_data',),
+        timeout=10.0, decode=False,
+    ),
+)
+
+
+@dataclass(slots=True)
+class Validated:
+    """ Ответ условного GET: not_modified - у клиента актуальная копия """
+
+    value: Any
+    validators: Validators
+    not_modified: bool = False
+
+
+class PoolWaitTrace:
+    """
+    Trace-колбэк httpcore: время от начала запроса до момента,
+    когда из пула получено соединение (начало connect или отправки)
+    """
+
+    __slots__ = ('started', 'pool_wait')
+
+    def __init__(self, started: float):
+        self.started = started
+        self.pool_wait: Optional[float] = None
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        if self.pool_wait is None and event_name.endswith(
+            ('connect_tcp.started', 'connect_unix_socket.started', 'send_request_headers.started')
+        ):
+            self.pool_wait = time.perf_counter() - self.started
+
+
+class EndpointCall:
+    """ Скомпилированный эндпоинт: привязка аргументов, заголовки и разбор ответа """
+
+    __slots__ = ('endpoint', 'name', 'method', 'path', 'args', 'query', 'body', 'headers', 'decode', 'error_status')
+
+    def __init__(self, endpoint: Endpoint):
+        self.endpoint = endpoint
+        self.name = endpoint.name
+        self.method = endpoint.method
+        self.path = endpoint.path
+        self.args = endpoint.args
+        self.query = tuple(endpoint.query.items())
+        self.body = endpoint.body
+        self.headers = JSON_HEADERS if endpoint.body is not None else None
+        self.decode = endpoint.decode
+        self.error_status = endpoint.error_status
+
+    def bind(self, args: tuple, kwargs: dict) -> dict:
+        """ Позиционные и именованные аргументы -> {имя аргумента: значение} """
+        if len(args) > len(self.args):
+            raise TypeError(f'{self.name}() takes {len(self.args)} arguments, got {len(args)}')
+        bound = dict(zip(self.args, args))
+        for key, value in kwargs.items():
+            if key not in self.args:
+                raise TypeError(f'{self.name}() got an unexpected argument {key!r}')
+            bound[key] = value
+        return bound
+
+    async def __call__(
+        self, service: "GatewayService", *args,
+        idempotency_key: str = None, validators: Optional[Validators] = None, **kwargs
+    ):
+        """
+        Исполняет запрос. С validators (пусть даже пустыми) это условный GET:
+        результат - Validated с валидаторами ответа
+        """
+        bound = self.bind(args, kwargs)
+
+        params = {param: bound[arg] for arg, param in self.query if bound.get(arg) is not None}
+        headers = self.headers
+        if idempotency_key:
+            headers = {**(headers or {}), "Idempotency-Key": idempotency_key}
+        if validators:
+            headers = {**(headers or {}), **validators.headers()}
+
+        content = self.body(bound) if self.body is not None else None
+        if isinstance(content, str):
+            content = content.encode()
+
+        started = time.perf_counter()
+        trace = PoolWaitTrace(started)
+        try:
+            resp = await service.session.request(
+                self.method,
+                service.gateway_url + self.path,
+                params=params or None,
+                content=content,
+                headers=headers,
+                timeout=service._timeout(self.name),
+                extensions={'trace': trace},
+            )
+        except Exception:
+            service.observe_call(
+                self.name, 'error', time.perf_counter() - started,
+                len(content or b''), 0, trace.pool_wait
+            )
+            raise
+        service.observe_call(
+            self.name, resp.status_code, time.perf_counter() - started,
+            len(content or b''), len(resp.content), trace.pool_wait
+        )
+        if validators is not None and resp.status_code == 304:
+            return Validated(None, Validators(
+                resp.headers.get('etag') or validators.etag,
+                resp.headers.get('last-modified') or validators.last_modified,
+            ), not_modified=True)
+
+        # Ответы с телом ждем только 200, для записей подходит любой 2xx
+        ok = resp.status_code == 200 if self.decode else resp.is_success
+        if not ok:
+            if self.error_status is not None:
+                raise HTTPException(status_code=self.error_status, detail='Server Internal Error')
+            raise HTTPException(status_code=resp.status_code, detail=resp.text)
+
+        value = loads(resp.content) if self.decode else None
+        if validators is not None:
+            return Validated(value, Validators(resp.headers.get('etag'), resp.headers.get('last-modified')))
+        return value
+
+
+def compile_registry(registry: tuple[Endpoint, ...]) -> dict[tuple[str, str], EndpointCall]:
+    """ (crud, name) -> EndpointCall """
+    return {(e.crud, e.name): EndpointCall(e) for e in registry}
+
+
+ENDPOINTS: dict[tuple[str, str], EndpointCall] = compile_registry(REGISTRY)
+BY_NAME: dict[str, Endpoint] = {e.name: e for e in REGISTRY}
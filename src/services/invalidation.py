@@ -0,0 +1,124 @@
+import asyncio
+import uuid
+from typing import Awaitable, Callable, Iterable, Optional
+
+from src.config import config
+from src.logconf import opt_logger as log
+from src.services.gateway import GatewayService, gateway_service
+from src.services.redis import redis_service
+from src.utils import json_codec
+
+logger = log.setup_logger('invalidation bus')
+
+# Что изменилось -> кэшируемые методы Gateway, которые это затрагивает
+SCOPES: dict[str, tuple[str, ...]] = {
+    'user': ('user_data', 'check_user_exists'),
+    'profile': ('user_data',),
+    'payment': ('payment_data', 'due_to', 'yookassa_link'),
+}
+
+Handler = Callable[[int, tuple[str, ...]], Awaitable[None]]
+
+
+class InvalidationBus:
+    """
+    Шина инвалидации кэшей через Redis pub/sub.
+
+    Сообщение в канале - JSON {"user_id": 1, "scope": ["payment"]}
+    (или "methods": [...] с именами методов Gateway). Его публикуют
+    сервис оплаты и веб-приложения; бот публикует сам после своих
+    записей в Gateway, чтобы остальные инстансы тоже сбросили кэш.
+    Каждый инстанс при получении удаляет записи кэша Gateway
+    и вызывает зарегистрированные обработчики (e.g. сброс данных FSM).
+    """
+
+    def __init__(self, gateway: GatewayService, channel: Optional[str] = None):
+        self.gateway = gateway
+        self.channel = channel or config.redis.invalidation_channel
+        self.instance = uuid.uuid4().hex
+        self._handlers: list[tuple[Handler, bool]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.received = 0
+        # Записи самого бота тоже рассылаются
+        gateway.cache.add_listener(self.publish)
+
+    def add_handler(self, handler: Handler, remote_only: bool = False) -> None:
+        """ remote_only: не вызывать для сообщений этого же инстанса (его данные уже актуальны) """
+        self._handlers.append((handler, remote_only))
+
+    async def publish(self, user_id: int, methods: Iterable[str]) -> None:
+        client = await redis_service.get_redis_client()
+        await client.publish(self.channel, json_codec.dumps({
+            'user_id': user_id, 'methods': list(methods), 'origin': self.instance,
+        }))
+
+    @staticmethod
+    def _methods(message: dict) -> tuple[str, ...]:
+        methods = set(message.get('methods') or ())
+        for scope in message.get('scope') or ():
+            methods.update(SCOPES.get(scope, ()))
+        if not methods:
+            # Без уточнения сбрасываем все данные пользователя
+            methods = {m for scope in SCOPES.values() for m in scope}
+        return tuple(methods)
+
+    async def _apply(self, message: dict) -> None:
+        user_id = int(message['user_id'])
+        methods = self._methods(message)
+        self.received += 1
+
+        # Свою запись в кэше Gateway мы уже сбросили
+        remote = message.get('origin') != self.instance
+        if remote:
+            await self.gateway.cache.invalidate(user_id, methods)
+
+        for handler, remote_only in self._handlers:
+            if remote_only and not remote: continue
+            try:
+                await handler(user_id, methods)
+            except Exception as e:
+                logger.warning(f'Invalidation handler failed for user {user_id}: {e}')
+
+    async def _listen(self) -> None:
+        """ Подписка с переподключением при обрыве соединения с Redis """
+        delay = 0.5
+        while True:
+            pubsub = None
+            try:
+                client = await redis_service.get_redis_client()
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                logger.info(f'Subscribed to invalidation channel {self.channel}')
+                delay = 0.5
+
+                async for raw in pubsub.listen():
+                    try:
+                        await self._apply(json_codec.loads(raw['data']))
+                    except Exception as e:
+                        logger.warning(f'Bad invalidation message {raw.get("data")!r}: {e}')
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Invalidation subscription lost, reconnecting in {delay:.1f}s: {e}')
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+invalidation_bus = InvalidationBus(gateway_service)
@@ -0,0 +1,270 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from src import models
+from src.config import config, GatewayConfig
+from src.exc import GatewayUnavailable, DeadlineExceeded
+from src.logconf import opt_logger as log
+from src.services.gateway import GatewayService, gateway_service
+from src.services.gateway_cache import extract_user_id
+from src.services.gateway_endpoints import BY_NAME, ENDPOINTS
+from src.services.redis import redis_service
+from src.utils import json_codec
+from src.utils.priority import Priority, priority
+from src.utils.retry import backoff_delay
+
+logger = log.setup_logger('gateway outbox')
+
+# Продлевает аренду, только если она все еще наша
+RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Переключение подписки -> ожидаемое значение is_active
+SUBSCRIPTION_TOGGLES = {'activate_subscription': True, 'deactivate_subscription': False}
+
+
+@dataclass
+class OutboxStats:
+    """ Счетчики outbox """
+
+    enqueued: int = 0       # Записей поставлено в stream
+    inline: int = 0         # Выполнено сразу (outbox выключен или Redis недоступен)
+    delivered: int = 0      # Доставлено в Gateway
+    retries: int = 0        # Повторных попыток доставки
+    dead: int = 0           # Отброшено в dead-letter stream
+
+
+class LeaseLost(Exception):
+    """ Аренду партиции перехватил другой инстанс """
+
+
+class GatewayOutbox:
+    """
+    Надежная отложенная доставка записей (POST/PUT) в Gateway через Redis stream.
+
+    Обработчик ставит запись в stream и сразу возвращается; фоновый
+    потребитель доставляет ее с повторами и одним ключом идемпотентности
+    на все попытки. Записи разложены по партициям по user_id: партицию
+    читает только инстанс, держащий ее аренду, строго по порядку -
+    так порядок записей одного пользователя сохраняется. Позиция чтения
+    хранится в Redis, после падения инстанса чтение продолжит другой.
+    Ошибки, которые не исправятся повтором (4xx), уходят в dead-letter stream
+    """
+
+    prefix = 'outbox:gateway'
+
+    def __init__(self, gateway: GatewayService, settings: Optional["GatewayConfig"] = None):
+        self.gateway = gateway
+        self.settings = settings or config.gateway
+        self.instance = uuid.uuid4().hex
+        self.stats = OutboxStats()
+        self._tasks: list[asyncio.Task] = []
+
+    def _stream(self, partition: int) -> str:
+        return f'{self.prefix}:{partition}'
+
+    def _partition(self, user_id: Optional[int]) -> int:
+        return (user_id or 0) % self.settings.outbox_partitions
+
+    @staticmethod
+    def _encode(value: Any) -> Any:
+        if isinstance(value, BaseModel):
+            return {'__model__': type(value).__name__, 'data': value.model_dump(mode='json')}
+        return value
+
+    @staticmethod
+    def _decode(value: Any) -> Any:
+        if isinstance(value, dict) and '__model__' in value:
+            return getattr(models, value['__model__']).model_validate(value['data'])
+        return value
+
+    async def enqueue(self, method_name: str, *args, **kwargs) -> None:
+        """ Ставит запись в outbox. Если Redis недоступен - выполняет ее сразу """
+        endpoint = BY_NAME[method_name]
+        user_id = extract_user_id(*args, **kwargs)
+        entry = {
+            'method': method_name,
+            'args': [self._encode(a) for a in args],
+            'kwargs': {k: self._encode(v) for k, v in kwargs.items()},
+            'key': uuid.uuid4().hex,
+            'created': time.time(),
+        }
+
+        if self.settings.outbox_enabled:
+            try:
+                client = await redis_service.get_redis_client()
+                await client.xadd(self._stream(self._partition(user_id)), {'entry': json_codec.dumps(entry)})
+                self.stats.enqueued += 1
+                await self._apply_locally(method_name, user_id, args, kwargs)
+                return
+            except Exception as e:
+                logger.warning(f'Outbox unavailable, sending {method_name} inline: {e}')
+
+        self.stats.inline += 1
+        await self._send(endpoint.crud, method_name, args, kwargs, entry['key'])
+
+    async def _apply_locally(self, method_name: str, user_id: Optional[int], args, kwargs: dict) -> None:
+        """
+        Пока запись ждет доставки, чтения этого инстанса видят ее результат:
+        устаревшие записи кэша сбрасываются (со слушателями - кэш подписки,
+        предзагрузка, шина инвалидации), а ожидаемые значения подставляются
+        в память процесса, как у ProfileWriter. После доставки кэш
+        сбрасывается еще раз и заполняется ответами Gateway
+        """
+        if user_id is None:
+            return
+        cache = self.gateway.cache
+        try:
+            payment = await cache.get_stale('payment_data', user_id)
+            await cache.invalidate_after(method_name, *args, **kwargs)
+
+            if method_name == 'add_user':
+                user = ENDPOINTS[('post', method_name)].bind(args, kwargs)['user_data']
+                cache.apply_local('user_data', user.model_dump(mode='json'), user_id, target='users')
+                cache.apply_local('check_user_exists', True, user_id)
+            elif method_name in SUBSCRIPTION_TOGGLES and isinstance(payment, dict):
+                is_active = SUBSCRIPTION_TOGGLES[method_name]
+                cache.apply_local('payment_data', {**payment, 'is_active': is_active}, user_id)
+        except Exception as e:
+            logger.warning(f'Failed to apply pending {method_name} to local cache: {e}')
+
+    async def _send(self, crud: str, method_name: str, args, kwargs: dict, key: str):
+        if crud == 'put':
+            return await self.gateway.put(method_name, *args, **kwargs)
+        return await self.gateway.post(method_name, *args, idempotency_key=key, **kwargs)
+
+    async def _deliver(self, entry: dict, client, partition: int) -> None:
+        """
+        Доставляет запись, повторяя временные сбои до успеха.
+        Пока ждет повтора, продлевает аренду партиции
+        """
+        method_name = entry['method']
+        args = [self._decode(a) for a in entry['args']]
+        kwargs = {k: self._decode(v) for k, v in entry['kwargs'].items()}
+
+        attempt = 1
+        while True:
+            try:
+                await self._send(BY_NAME[method_name].crud, method_name, args, kwargs, entry['key'])
+                self.stats.delivered += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._is_transient(e):
+                    raise
+                self.stats.retries += 1
+                delay = backoff_delay(attempt, self.settings.retry_base_delay, self.settings.outbox_retry_max_delay)
+                retry_after = getattr(e, 'retry_after', 0.0)
+                logger.warning(f'Outbox delivery of {method_name} failed, retry in {max(delay, retry_after):.1f}s: {e!r}')
+                await self._wait_holding(client, partition, max(delay, retry_after))
+                attempt += 1
+
+    async def _wait_holding(self, client, partition: int, delay: float) -> None:
+        step = self.settings.outbox_lease / 3
+        while delay > 0:
+            await asyncio.sleep(min(delay, step))
+            delay -= step
+            if not await self._acquire(client, partition):
+                raise LeaseLost(f'Outbox partition {partition} lease lost')
+
+    def _is_transient(self, error: Exception) -> bool:
+        # Разомкнутая цепь и 5xx пройдут; ошибки данных повтор не исправит
+        return isinstance(error, (GatewayUnavailable, DeadlineExceeded)) or self.gateway._is_retryable(error)
+
+    async def _acquire(self, client, partition: int) -> bool:
+        """ Берет или продлевает аренду партиции """
+        key = f'{self.prefix}:lease:{partition}'
+        lease_ms = int(self.settings.outbox_lease * 1000)
+        if await client.eval(RENEW_LEASE, 1, key, self.instance, lease_ms):
+            return True
+        return bool(await client.set(key, self.instance, nx=True, px=lease_ms))
+
+    async def _consume(self, partition: int) -> None:
+        """ Цикл чтения одной партиции """
+        stream = self._stream(partition)
+        cursor_key = f'{self.prefix}:cursor:{partition}'
+        lease = self.settings.outbox_lease
+
+        while True:
+            try:
+                client = await redis_service.get_redis_client()
+                if not await self._acquire(client, partition):
+                    await asyncio.sleep(lease / 2)
+                    continue
+
+                cursor = await client.get(cursor_key) or b'0-0'
+                # Блокируемся не дольше трети аренды, чтобы успеть ее продлить
+                response = await client.xread(
+                    {stream: cursor}, count=self.settings.outbox_batch, block=int(lease * 1000 / 3)
+                )
+                for _, entries in response or ():
+                    for entry_id, fields in entries:
+                        if not await self._acquire(client, partition):
+                            raise LeaseLost(f'Outbox partition {partition} lease lost')
+                        await self._handle(client, partition, entry_id, fields)
+                        await client.set(cursor_key, entry_id)
+                        await client.xdel(stream, entry_id)
+
+            except asyncio.CancelledError:
+                raise
+            except LeaseLost as e:
+                # Запись дочитает новый владелец партиции
+                logger.warning(str(e))
+            except Exception as e:
+                logger.error(f'Outbox partition {partition} consumer error: {e}')
+                await asyncio.sleep(1.0)
+
+    async def _handle(self, client, partition: int, entry_id, fields: dict) -> None:
+        entry = json_codec.loads(fields[b'entry'])
+        try:
+            await self._deliver(entry, client, partition)
+        except (asyncio.CancelledError, LeaseLost):
+            raise
+        except Exception as e:
+            self.stats.dead += 1
+            logger.error(f'Outbox dropped {entry["method"]} ({entry_id}) to dead letters: {e!r}')
+            entry['error'] = repr(e)
+            await client.xadd(f'{self.prefix}:dead', {'entry': json_codec.dumps(entry)})
+
+    def start(self) -> None:
+        """ Запускает потребителей всех партиций """
+        if not self.settings.outbox_enabled or self._tasks:
+            return
+        # Доставка фоновая: задачи наследуют приоритет из контекста
+        with priority(Priority.BACKGROUND):
+            self._tasks = [
+                asyncio.create_task(self._consume(partition))
+                for partition in range(self.settings.outbox_partitions)
+            ]
+        logger.info(f'Outbox consumers started ({len(self._tasks)} partitions)')
+
+    async def close(self) -> None:
+        """ Останавливает потребителей; недоставленное дочитает следующий владелец партиции """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if not self.settings.outbox_enabled:
+            return
+        # Освобождаем аренду, чтобы другой инстанс подхватил партиции сразу
+        try:
+            client = await redis_service.get_redis_client()
+            for partition in range(self.settings.outbox_partitions):
+                key = f'{self.prefix}:lease:{partition}'
+                await client.eval(RENEW_LEASE, 1, key, self.instance, 1)
+        except Exception as e:
+            logger.warning(f'Failed to release outbox leases: {e}')
+
+
+gateway_outbox = GatewayOutbox(gateway_service)
@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from src.config import config, GatewayConfig
+from src.exc import GatewayUnavailable, DeadlineExceeded
+from src.logconf import opt_logger as log
+from src.models import User, Profile
+from src.services.gateway import GatewayService, gateway_service
+from src.utils.priority import Priority, priority
+
+logger = log.setup_logger('profile writer')
+
+ProfileModel = Union[User, Profile]
+
+# Цель user_data, которую обновляет модель
+TARGETS = {User: 'users', Profile: 'profiles'}
+
+
+@dataclass
+class ProfileWriterStats:
+    """ Счетчики отложенной записи профиля """
+
+    updates: int = 0        # Изменений от обработчиков
+    writes: int = 0         # Отправленных PUT update_profile
+    coalesced: int = 0      # Изменений, склеенных с уже ожидающими
+    failed: int = 0         # Неудачных попыток записи
+    dropped: int = 0        # Изменений, отброшенных после ошибки
+
+
+class ProfileWriter:
+    """
+    Склеивает изменения профиля пользователя в одну запись update_profile.
+
+    Изменения User / Profile копятся в течение окна debounce (не дольше
+    max_delay с первого изменения) и отправляются одним PUT на модель.
+    Локальный кэш Gateway обновляется сразу, так что чтения видят
+    новые данные до записи. flush() отправляет изменения немедленно.
+    Временные сбои повторяются не больше profile_write_max_attempts раз,
+    ошибки данных (4xx) не повторяются
+    """
+
+    def __init__(
+        self,
+        gateway: GatewayService,
+        settings: Optional["GatewayConfig"] = None,
+    ):
+        self.gateway = gateway
+        self.settings = settings or config.gateway
+        self._pending: dict[int, dict[type, ProfileModel]] = {}
+        self._first_at: dict[int, float] = {}
+        self._timers: dict[int, asyncio.Task] = {}
+        # Записи одного пользователя уходят строго по очереди
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._attempts: dict[tuple[int, type], int] = {}
+        self._closing = False
+        self.stats = ProfileWriterStats()
+
+    async def update(self, model: ProfileModel, flush: bool = False) -> None:
+        """ Ставит изменение в очередь пользователя (или сразу пишет при flush) """
+        user_id = model.user_id
+        self.stats.updates += 1
+
+        pending = self._pending.setdefault(user_id, {})
+        previous = pending.get(type(model))
+        if previous is not None:
+            self.stats.coalesced += 1
+            model = previous.model_copy(update=model.model_dump(exclude_unset=True))
+        pending[type(model)] = model
+        self._first_at.setdefault(user_id, time.monotonic())
+
+        self.gateway.cache.apply_local(
+            'user_data', model.model_dump(mode='json'), user_id, target=TARGETS[type(model)]
+        )
+
+        if flush or self._closing:
+            # Явную запись ждет обработчик - ошибку получит он
+            return await self.flush(user_id, raise_errors=flush)
+        self._schedule(user_id)
+
+    def _schedule(self, user_id: int) -> None:
+        """ Перезапускает таймер debounce, не выходя за max_delay """
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        waited = time.monotonic() - self._first_at[user_id]
+        delay = min(self.settings.profile_write_debounce, max(0.0, self.settings.profile_write_max_delay - waited))
+        # Пустой контекст: дедлайн апдейта, в котором запланирована запись, к ней не относится
+        self._timers[user_id] = asyncio.create_task(
+            self._flush_later(user_id, delay), context=contextvars.Context()
+        )
+
+    async def _flush_later(self, user_id: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # Таймер больше нельзя отменить: запись уже началась
+        self._timers.pop(user_id, None)
+        # Запись по таймеру никто не ждет - она идет фоновой полосой
+        with priority(Priority.BACKGROUND):
+            await self.flush(user_id)
+
+    async def flush(self, user_id: int, raise_errors: bool = False) -> None:
+        """ Немедленно отправляет накопленные изменения пользователя """
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            pending = self._pending.pop(user_id, None)
+            self._first_at.pop(user_id, None)
+            if pending:
+                await self._write(user_id, pending, raise_errors)
+
+        if not lock.locked() and user_id not in self._pending:
+            self._locks.pop(user_id, None)
+
+    async def _write(self, user_id: int, pending: dict[type, ProfileModel], raise_errors: bool = False) -> None:
+        error: Optional[Exception] = None
+        for model_type, model in pending.items():
+            key = (user_id, model_type)
+            try:
+                await self.gateway.put('update_profile', new_data=model)
+                self.stats.writes += 1
+                self._attempts.pop(key, None)
+            except Exception as e:
+                self.stats.failed += 1
+                attempts = self._attempts.pop(key, 0) + 1
+                if (
+                    raise_errors or self._closing or not self._is_transient(e)
+                    or attempts >= self.settings.profile_write_max_attempts
+                ):
+                    # Локальный кэш уже сброшен записью (invalidate_after)
+                    self.stats.dropped += 1
+                    logger.error(f'Profile update for user {user_id} dropped after {attempts} attempt(s): {e!r}')
+                    error = error or e
+                    continue
+
+                # Возвращаем в очередь, если его не заменило более новое изменение
+                logger.warning(f'Profile update for user {user_id} failed (attempt {attempts}), will retry: {e!r}')
+                self._attempts[key] = attempts
+                retry = self._pending.setdefault(user_id, {})
+                retry.setdefault(model_type, model)
+                self._first_at.setdefault(user_id, time.monotonic())
+                self._schedule(user_id)
+
+        if raise_errors and error is not None:
+            raise error
+
+    def _is_transient(self, error: Exception) -> bool:
+        return isinstance(error, (GatewayUnavailable, DeadlineExceeded)) or self.gateway._is_retryable(error)
+
+    async def close(self) -> None:
+        """ Отправляет все ожидающие изменения (при остановке бота) """
+        self._closing = True
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        await asyncio.gather(*(self.flush(user_id) for user_id in list(self._pending)))
+
+
+profile_writer = ProfileWriter(gateway_service)
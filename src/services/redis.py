@@ -1,3 +1,5 @@
+import asyncio
+
 from src.config import config
 from redis.asyncio.client import Redis as aioredis
 
@@ -19,6 +21,12 @@ class RedisService:
             await self.redis_client.ping()
             self.initialized = True
 
+    async def warm_up(self, connections: int = None):
+        """ Открывает соединения пула заранее: PING параллельно занимает разные соединения """
+        client = await self.get_redis_client()
+        connections = connections or config.redis.warmup_connections
+        await asyncio.gather(*(client.ping() for _ in range(connections)))
+
     async def disconnect(self):
         if self.redis_client:
             await self.redis_client.aclose()
@@ -1,11 +1,12 @@
-from datetime import datetime
-
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.exceptions import WatchError
 
-from src.dependencies import get_gateway
+from src.dependencies import get_profile_writer
 from src.exc import StorageDataException
-from src.utils.timer import get_current_naive_str, get_current_datetime
+from src.utils import prefetch
 
 
 class MultiSelection(StatesGroup):
@@ -18,13 +19,25 @@ class MultiSelection(StatesGroup):
 
 class DataStorage:
 
+    # Поля, которые DataStorage кэширует в FSM (см. UserBundle.to_storage).
+    # user_id и lang_code не сбрасываются: по ним обработчики отвечают сразу
+    cached_keys = (
+        "username", "first_name", "language", "fluency", "topics", "camefrom",
+        "is_active", "due_to", "birthday", "nickname", "email", "gender",
+        "dating", "intro", "status", "age",
+    )
+
     async def get_storage_data(
         self, user_id: int, state: FSMContext, renew: bool = False
     ) -> dict:
         """Достаем нужные данные о пользователе"""
 
         # При renew = True обновляет данные
-        if renew: await state.clear()
+        if renew:
+            # Отложенные изменения профиля не должны потеряться при перечитывании
+            await (await get_profile_writer()).flush(user_id)
+            await state.clear()
+            prefetch.forget(user_id)
 
         s_data = await state.get_data()
 
@@ -41,64 +54,64 @@ class DataStorage:
         await state.update_data(user_data)
         return user_data
 
+    async def evict(self, state: FSMContext) -> None:
+        """ Сбрасывает кэшированные данные: следующий get_storage_data перечитает их """
+        if isinstance(state.storage, RedisStorage):
+            await self._evict_redis(state.storage, state.key)
+            return
+
+        data = await state.get_data()
+        if any(key in data for key in self.cached_keys):
+            await state.set_data({k: v for k, v in data.items() if k not in self.cached_keys})
+
+    async def _evict_redis(self, storage: RedisStorage, key: StorageKey) -> None:
+        """
+        Удаляет только кэшированные ключи в транзакции WATCH/MULTI:
+        параллельный update_data обработчика не затирается, а повторяет попытку
+        """
+        redis_key = storage.key_builder.build(key, "data")
+        async with storage.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(redis_key)
+                    raw = await pipe.get(redis_key)
+                    if raw is None: return
+                    data = storage.json_loads(raw)
+                    if not any(k in data for k in self.cached_keys): return
+
+                    for k in self.cached_keys:
+                        data.pop(k, None)
+                    pipe.multi()
+                    if data:
+                        pipe.set(redis_key, storage.json_dumps(data), keepttl=True)
+                    else:
+                        pipe.delete(redis_key)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    async def evict_user(self, storage: BaseStorage, bot_id: int, user_id: int) -> None:
+        """ evict по user_id без апдейта (e.g. с шины инвалидации): чат - личка пользователя """
+        key = StorageKey(bot_id=bot_id, chat_id=user_id, user_id=user_id)
+        await self.evict(FSMContext(storage, key))
+
     @staticmethod
     async def set_user_info(user_id: int) -> dict:
         """
         Гарантирует, что машина состояния
         имеет все данные о пользователе
         """
-        gateway = await get_gateway()
-        # Отправляем запрос в БД на получение информации
-        async with gateway:
-            # Базовая информация о пользователе
-            user_info = await gateway.get(
-                'user_data', user_id, target='users'
-            )
-            # Если аккаунт еще не создан - выход
-            if not user_info: return {}
-
-            # Платежные данные о пользователе
-            payment_info = await gateway.get(
-                'payment_data', user_id
-            )
-            # Доп. регистрация о пользователе
-            profile_info = await gateway.get(
-                'user_data', user_id, target='profiles'
-            )
-
-        result = {
-            "user_id": user_id,
-            "username": user_info["username"],
-            "first_name": user_info["first_name"],
-            "language": user_info["language"],
-            "fluency": user_info["fluency"],
-            "topics": ', '.join(user_info["topics"]),
-            "camefrom": user_info["camefrom"],
-            "lang_code": user_info["lang_code"],
-            "is_active": payment_info.get("is_active", False),
-            "due_to": payment_info.get("until", lambda: get_current_naive_str)
-        }
-
-        if profile_info and not profile_info.get('error', False):
-            birthday = profile_info["birthday"]
-
-            if isinstance(birthday, str):
-                birthday = datetime.fromisoformat(birthday)
-
-
-            result.update(
-                {
-                    "birthday": profile_info["birthday"],
-                    "nickname": profile_info["nickname"],
-                    "email": profile_info["email"],
-                    "gender": profile_info["gender"],
-                    "dating": profile_info["dating"],
-                    "intro": profile_info['intro'],
-                    "status": profile_info["status"],
-                    "age": (get_current_datetime()-birthday).days//365
-                }
-            )
+        # Запрос уже запущен при получении апдейта (PrefetchMiddleware),
+        # иначе - параллельные запросы или один составной
+        bundle = await prefetch.get_user_bundle(user_id)
+
+        # Если аккаунт еще не создан - выход
+        if bundle is None: return {}
 
+        # Ответы уже разобраны в типизированные записи
+        result = bundle.to_storage()
+        result["user_id"] = user_id
         return result
 
 
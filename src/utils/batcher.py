@@ -0,0 +1,100 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from src.logconf import opt_logger as log
+from src.utils.deadline import detached, wait_within
+
+logger = log.setup_logger('micro batcher')
+
+
+@dataclass
+class BatcherStats:
+    """ Счетчики пакетной загрузки """
+
+    loads: int = 0          # Всего запрошенных ключей
+    batches: int = 0        # Отправленных пакетов
+    batched_keys: int = 0   # Ключей, ушедших в пакеты
+
+
+class MicroBatcher:
+    """
+    Пакетная загрузка в стиле DataLoader: ключи, запрошенные
+    в течение короткого окна, уходят одним вызовом batch_fn,
+    а результаты раздаются обратно ожидающим.
+
+    batch_fn получает список ключей и возвращает словарь key -> value,
+    отсутствующие в ответе ключи получают None, а значение-исключение
+    пробрасывается только ожидающим этого ключа.
+
+    Пакет исполняется без дедлайна того, кто его открыл или заполнил:
+    каждый ожидающий ждет свой ключ не дольше собственного дедлайна.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[Hashable]], Awaitable[dict[Hashable, Any]]],
+        window: float = 0.005,
+        max_batch: int = 100,
+    ):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = BatcherStats()
+
+        self._pending: dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable, name: Optional[str] = None) -> Any:
+        self.stats.loads += 1
+        loop = asyncio.get_running_loop()
+
+        future = self._pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            self._pending[key] = future
+
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+
+        return await wait_within(future, name or f'batch load {key}')
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._run(batch), context=detached())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[Hashable, asyncio.Future]) -> None:
+        self.stats.batches += 1
+        self.stats.batched_keys += len(batch)
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            logger.warning(f'Batch of {len(batch)} keys failed: {e}')
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Ошибку получат ожидающие, остальным не логировать
+                    future.exception()
+            return
+
+        for key, future in batch.items():
+            if future.done():
+                continue
+            result = results.get(key)
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+                future.exception()
+            else:
+                future.set_result(result)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from src.exc import BulkheadFull
+from src.logconf import opt_logger as log
+
+logger = log.setup_logger('bulkhead')
+
+
+@dataclass
+class BulkheadStats:
+    """ Счетчики одного bulkhead """
+
+    admitted: int = 0       # Получили слот
+    queued: int = 0         # Из них ждали в очереди
+    rejected: int = 0       # Отклонены: очередь полна
+    timed_out: int = 0      # Отклонены: не дождались слота
+
+
+class Bulkhead:
+    """
+    Ограничивает число одновременных запросов одного метода Gateway.
+
+    Сверх max_concurrent вызовы ждут слот в FIFO очереди не дольше
+    queue_timeout; если в очереди уже max_queue ожидающих - отказ сразу.
+    Так всплеск одного метода не займет все соединения пула.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 100, queue_timeout: float = 1.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.stats = BulkheadStats()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        """ Слот на время запроса; timeout - не дольше остатка дедлайна """
+        waited = await self._acquire(timeout)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    async def _acquire(self, timeout: Optional[float]) -> float:
+        """ Возвращает время ожидания в очереди, сек. """
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.stats.admitted += 1
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            self.stats.rejected += 1
+            raise BulkheadFull(self.name, 'queue is full')
+
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+        except TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            self.stats.timed_out += 1
+            raise BulkheadFull(self.name, f'no slot in {timeout:.2f}s') from None
+        except asyncio.CancelledError:
+            # Слот уже был передан нам - отдаем его следующему
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+        self.stats.admitted += 1
+        self.stats.queued += 1
+        return time.perf_counter() - started
+
+    def _release(self) -> None:
+        # Слот переходит первому живому ожидающему, не освобождаясь
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
@@ -0,0 +1,87 @@
+import time
+from enum import Enum
+
+from src.exc import GatewayUnavailable
+from src.logconf import opt_logger as log
+
+logger = log.setup_logger('circuit breaker')
+
+
+class CircuitState(str, Enum):
+    CLOSED = 'closed'           # Запросы идут как обычно
+    OPEN = 'open'               # Запросы сразу отклоняются
+    HALF_OPEN = 'half_open'     # Пропускаем пробные запросы
+
+
+class CircuitBreaker:
+    """
+    Автомат защиты для одного метода Gateway.
+
+    После failure_threshold ошибок подряд цепь размыкается
+    и все вызовы мгновенно получают GatewayUnavailable. Через
+    recovery_timeout пропускается до half_open_max_calls пробных
+    запросов: успех замыкает цепь, ошибка снова размыкает.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 10.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+        self.rejected = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state is CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """ Проверяет, можно ли отправить запрос; иначе GatewayUnavailable """
+        state = self.state
+
+        if state is CircuitState.CLOSED:
+            return
+
+        if state is CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return
+
+        self.rejected += 1
+        retry_after = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+        raise GatewayUnavailable(self.name, retry_after)
+
+    def record_success(self) -> None:
+        if self._state is not CircuitState.CLOSED:
+            logger.info(f'Circuit {self.name} closed')
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+
+    def record_cancel(self) -> None:
+        """ Пробный запрос отменен, не дождавшись ответа """
+        if self._state is CircuitState.HALF_OPEN and self._half_open_calls:
+            self._half_open_calls -= 1
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state is CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state is not CircuitState.OPEN:
+                logger.warning(f'Circuit {self.name} opened after {self._failures} failures')
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
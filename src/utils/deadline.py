@@ -0,0 +1,68 @@
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from src.exc import DeadlineExceeded
+
+# Абсолютный момент (time.monotonic), к которому обработка апдейта должна завершиться
+_deadline: ContextVar[Optional[float]] = ContextVar('update_deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Ограничивает время всех запросов к Gateway внутри блока.
+    Вложенный дедлайн не может быть позже внешнего.
+    """
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        at = min(at, current)
+
+    token = _deadline.set(at)
+    try:
+        yield at
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """ Сколько секунд осталось до дедлайна (None - дедлайна нет) """
+    at = _deadline.get()
+    if at is None:
+        return None
+    return at - time.monotonic()
+
+
+def detached() -> contextvars.Context:
+    """
+    Копия текущего контекста без дедлайна - для общей работы, которую ждут
+    несколько вызывающих: дедлайн первого из них не должен обрывать ее для остальных
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+
+async def wait_within(future: asyncio.Future, name: str) -> Any:
+    """
+    Ждет общую работу не дольше своего дедлайна. По дедлайну - DeadlineExceeded
+    только этому вызывающему, сама работа продолжается для остальных (shield)
+    """
+    left = time_left()
+    if left is None:
+        return await asyncio.shield(future)
+    if left <= 0:
+        raise DeadlineExceeded(f'No time left for {name}')
+
+    timeout = asyncio.timeout(left)
+    try:
+        async with timeout:
+            return await asyncio.shield(future)
+    except TimeoutError:
+        if not timeout.expired():
+            raise
+        raise DeadlineExceeded(f'{name} abandoned: update deadline exceeded') from None
@@ -0,0 +1,26 @@
+"""
+Быстрое (де)кодирование JSON: orjson (зависимость проекта),
+без него - стандартный json. Оба принимают bytes напрямую.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - окружение без зависимостей проекта
+    orjson = None
+
+
+if orjson is not None:
+    def loads(data: bytes | str) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+else:
+    def loads(data: bytes | str) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
@@ -0,0 +1,35 @@
+from collections import deque
+from typing import Optional
+
+
+class LatencyWindow:
+    """
+    Скользящее окно последних задержек (в секундах)
+    для оценки перцентилей одного метода Gateway.
+
+    Отсортированная копия пересчитывается не чаще,
+    чем раз в refresh_every наблюдений.
+    """
+
+    def __init__(self, size: int = 1000, refresh_every: int = 20):
+        self.refresh_every = refresh_every
+        self._samples: deque[float] = deque(maxlen=size)
+        self._sorted: list[float] = []
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._stale += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """ p-й перцентиль (0..100) или None, если данных нет """
+        if not self._samples:
+            return None
+        if not self._sorted or self._stale >= self.refresh_every:
+            self._sorted = sorted(self._samples)
+            self._stale = 0
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * p / 100))
+        return self._sorted[index]
@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Простой LRU кэш в памяти процесса с ограничением
+    по размеру и временем жизни записей.
+
+    Записи можно объединять в группы (например, по user_id),
+    чтобы разом удалять все связанные ключи. Просроченные записи
+    не удаляются при чтении, пока их не вытеснят: get_stale отдает
+    их, когда источник данных недоступен.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at, group, value)
+        self._data: OrderedDict[Hashable, tuple[float, Hashable, Any]] = OrderedDict()
+        self._groups: dict[Hashable, set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+
+        expires_at, _, value = item
+        if expires_at <= time.monotonic():
+            return default
+
+        # Отмечаем запись как недавно использованную
+        self._data.move_to_end(key)
+        return value
+
+    def get_stale(self, key: Hashable, max_stale: float, default: Any = None) -> Any:
+        """ Значение, просроченное не более чем на max_stale секунд """
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+
+        expires_at, _, value = item
+        if time.monotonic() - expires_at > max_stale:
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, group: Hashable = None, ttl: Optional[float] = None) -> None:
+        if key in self._data:
+            self.delete(key)
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, group, value)
+        if group is not None:
+            self._groups.setdefault(group, set()).add(key)
+
+        # Вытесняем самые старые записи
+        while len(self._data) > self.maxsize:
+            oldest = next(iter(self._data))
+            self.delete(oldest)
+
+    def delete(self, key: Hashable) -> None:
+        item = self._data.pop(key, None)
+        if item is None:
+            return
+
+        group = item[1]
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+    def delete_group(self, group: Hashable) -> int:
+        """ Удаляет все записи группы, возвращает их количество """
+        keys = self._groups.pop(group, set())
+        for key in keys:
+            self._data.pop(key, None)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._groups.clear()
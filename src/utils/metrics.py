@@ -0,0 +1,229 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from src.logconf import opt_logger as log
+
+logger = log.setup_logger('metrics')
+
+# Границы корзин гистограмм задержек, сек.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """ Гистограмма с фиксированными корзинами (как в Prometheus) """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # последняя корзина: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self) -> "Histogram":
+        clone = Histogram(self.buckets)
+        clone.counts, clone.sum, clone.count = list(self.counts), self.sum, self.count
+        return clone
+
+    def percentile(self, p: float) -> Optional[float]:
+        """ Оценка перцентиля по верхней границе корзины """
+        if not self.count:
+            return None
+        rank, seen = self.count * p / 100, 0
+        for bound, count in zip((*self.buckets, float('inf')), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+@dataclass
+class MetricsSnapshot:
+    """ Неизменяемый срез всех метрик на момент taken_at """
+
+    taken_at: float
+    counters: dict[tuple[str, Labels], float] = field(default_factory=dict)
+    gauges: dict[tuple[str, Labels], float] = field(default_factory=dict)
+    histograms: dict[tuple[str, Labels], Histogram] = field(default_factory=dict)
+    help: dict[str, str] = field(default_factory=dict)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, _labels(labels)), 0.0)
+
+    def gauge(self, name: str, **labels) -> Optional[float]:
+        return self.gauges.get((name, _labels(labels)))
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        return self.histograms.get((name, _labels(labels)))
+
+
+# Сборщик вызывается при снятии среза и возвращает
+# (kind, name, labels, value), kind: 'counter' | 'gauge'
+Collector = Callable[[], Iterable[tuple[str, str, dict, float]]]
+
+
+class MetricsRegistry:
+    """ Хранилище метрик процесса: счетчики, показатели и гистограммы с метками """
+
+    def __init__(self):
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._gauges: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._help: dict[str, str] = {}
+        self._collectors: list[Collector] = []
+        self.exporters: list["MetricsExporter"] = []
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, _labels(labels))
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        self._gauges[(name, _labels(labels))] = value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        key = (name, _labels(labels))
+        self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def snapshot(self) -> MetricsSnapshot:
+        snapshot = MetricsSnapshot(
+            taken_at=time.time(),
+            counters=dict(self._counters),
+            gauges=dict(self._gauges),
+            histograms={key: h.copy() for key, h in self._histograms.items()},
+            help=dict(self._help),
+        )
+        for collector in self._collectors:
+            for kind, name, labels, value in collector():
+                target = snapshot.counters if kind == 'counter' else snapshot.gauges
+                target[(name, _labels(labels))] = float(value)
+        return snapshot
+
+    # Экспорт
+    def add_exporter(self, exporter: "MetricsExporter") -> None:
+        if not isinstance(exporter, MetricsExporter):
+            raise TypeError(f'{type(exporter).__name__} is not a MetricsExporter')
+        self.exporters.append(exporter)
+
+    async def export(self) -> None:
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            try:
+                await exporter.export(snapshot)
+            except Exception as e:
+                logger.warning(f'Metrics exporter {type(exporter).__name__} failed: {e}')
+
+    async def run_export_loop(self, interval: float) -> None:
+        """ Фоновая задача: периодически отдает срез всем экспортерам """
+        while True:
+            await asyncio.sleep(interval)
+            await self.export()
+
+
+class MetricsExporter(ABC):
+    """ Интерфейс экспортера: получает срез метрик """
+
+    @abstractmethod
+    async def export(self, snapshot: MetricsSnapshot) -> None:
+        ...
+
+
+class InMemoryExporter(MetricsExporter):
+    """ Хранит последние срезы в памяти (для отладки и админ-команд) """
+
+    def __init__(self, history: int = 60):
+        self.snapshots: deque[MetricsSnapshot] = deque(maxlen=history)
+
+    async def export(self, snapshot: MetricsSnapshot) -> None:
+        self.snapshots.append(snapshot)
+
+    @property
+    def last(self) -> Optional[MetricsSnapshot]:
+        return self.snapshots[-1] if self.snapshots else None
+
+
+class PrometheusFileExporter(MetricsExporter):
+    """ Пишет срез в текстовом формате Prometheus (для node_exporter textfile) """
+
+    def __init__(self, path: str, prefix: str = ''):
+        self.path = path
+        self.prefix = prefix
+
+    async def export(self, snapshot: MetricsSnapshot) -> None:
+        text = format_prometheus(snapshot, self.prefix)
+        await asyncio.to_thread(self._write, text)
+
+    def _write(self, text: str) -> None:
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+
+def _format_labels(labels: Labels, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = (*labels, *extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    )
+    return '{' + body + '}'
+
+
+def format_prometheus(snapshot: MetricsSnapshot, prefix: str = '') -> str:
+    """ Срез метрик в текстовом формате экспозиции Prometheus """
+    lines: list[str] = []
+
+    def header(name: str, kind: str) -> None:
+        if name in snapshot.help:
+            lines.append(f'# HELP {prefix}{name} {snapshot.help[name]}')
+        lines.append(f'# TYPE {prefix}{name} {kind}')
+
+    for kind, series in (('counter', snapshot.counters), ('gauge', snapshot.gauges)):
+        for name in sorted({name for name, _ in series}):
+            header(name, kind)
+            for (series_name, labels), value in sorted(series.items()):
+                if series_name == name:
+                    lines.append(f'{prefix}{name}{_format_labels(labels)} {value:g}')
+
+    for name in sorted({name for name, _ in snapshot.histograms}):
+        header(name, 'histogram')
+        for (series_name, labels), histogram in sorted(snapshot.histograms.items(), key=lambda i: i[0]):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, float('inf')), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{prefix}{name}_bucket{_format_labels(labels, (("le", le),))} {cumulative}')
+            lines.append(f'{prefix}{name}_sum{_format_labels(labels)} {histogram.sum:g}')
+            lines.append(f'{prefix}{name}_count{_format_labels(labels)} {histogram.count}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,74 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Coroutine, Optional
+
+from src.dependencies import get_gateway
+from src.logconf import opt_logger as log
+from src.utils.deadline import detached, wait_within
+
+if TYPE_CHECKING:
+    from src.models import PaymentRecord, UserBundle
+
+logger = log.setup_logger('prefetch')
+
+# Задачи предзагрузки данных пользователя, запущенные при получении апдейта
+_prefetched: ContextVar[Optional[dict[int, asyncio.Task]]] = ContextVar('prefetched_user_context', default=None)
+
+
+def _consume_error(task: asyncio.Task) -> None:
+    # Ошибку получит тот, кто дождется задачи; если никто - не шумим в логах
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug(f'User context prefetch failed: {task.exception()!r}')
+
+
+@contextmanager
+def prefetch(user_id: int, bundle: Coroutine[Any, Any, Optional["UserBundle"]]):
+    """
+    Запускает загрузку UserBundle в фоне на время обработки апдейта.
+    Загрузка идет без дедлайна: его применяет к своему ожиданию каждый потребитель
+    """
+    task = asyncio.create_task(bundle, context=detached())
+    task.add_done_callback(_consume_error)
+    token = _prefetched.set({user_id: task})
+    try:
+        yield task
+    finally:
+        _prefetched.reset(token)
+
+
+def forget(user_id: int) -> None:
+    """ Данные пользователя изменились - предзагруженный ответ больше не годится """
+    tasks = _prefetched.get()
+    if tasks:
+        tasks.pop(user_id, None)
+
+
+async def get_user_bundle(user_id: int) -> Optional["UserBundle"]:
+    """ UserBundle из уже запущенной предзагрузки или новым запросом к Gateway """
+    tasks = _prefetched.get()
+    task = tasks.get(user_id) if tasks else None
+    if task is not None:
+        # shield: отмена (или дедлайн) одного потребителя не отменяет общую загрузку
+        return await wait_within(task, 'user_bundle')
+
+    gateway = await get_gateway()
+    return await gateway.get_user_bundle(user_id)
+
+
+async def get_payment(user_id: int) -> Optional["PaymentRecord"]:
+    """ Платежные данные: из предзагрузки, если она запущена """
+    tasks = _prefetched.get()
+    if not tasks or user_id not in tasks:
+        gateway = await get_gateway()
+        return await gateway.get_payment(user_id)
+
+    try:
+        bundle = await get_user_bundle(user_id)
+    except Exception as e:
+        # Бандл мог упасть на данных пользователя или профиля -
+        # подписка от них не зависит, запрашиваем только ее
+        logger.debug(f'Prefetched bundle failed for user {user_id}, fetching payment alone: {e!r}')
+        gateway = await get_gateway()
+        return await gateway.get_payment(user_id)
+    return bundle.payment if bundle is not None else None
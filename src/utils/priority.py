@@ -0,0 +1,148 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Optional
+
+from src.exc import BulkheadFull
+
+
+class Priority(str, Enum):
+    INTERACTIVE = 'interactive'     # Обработчики апдейтов: пользователь ждет ответа
+    BACKGROUND = 'background'       # Фоновые задачи: рассылки, прогрев кэша, outbox
+
+
+_priority: ContextVar[Priority] = ContextVar('gateway_priority', default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def priority(value: Priority):
+    """ Приоритет всех запросов к Gateway внутри блока (и созданных в нем задач) """
+    token = _priority.set(value)
+    try:
+        yield value
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@dataclass
+class LaneStats:
+    """ Счетчики одной полосы приоритета """
+
+    admitted: int = 0
+    queued: int = 0
+    timed_out: int = 0
+
+
+@dataclass
+class Lane:
+    limit: int                  # Собственный бюджет одновременных запросов полосы
+    weight: float               # Доля при выборе между ожидающими полосами
+    active: int = 0
+    current_weight: float = 0.0
+    waiters: deque = field(default_factory=deque)
+    stats: LaneStats = field(default_factory=LaneStats)
+
+
+class PriorityScheduler:
+    """
+    Общий лимит одновременных запросов к Gateway, поделенный на полосы приоритета.
+
+    У каждой полосы свой бюджет: фоновая полоса не может занять больше
+    своего limit, поэтому остаток пула всегда доступен обработчикам.
+    Когда слот освобождается, а ждут обе полосы, следующую выбирает
+    плавный взвешенный round-robin по weight - фоновые задачи получают
+    свою долю и не голодают, но и не вытесняют интерактивные запросы.
+    """
+
+    def __init__(self, total: int, lanes: dict[Priority, tuple[int, float]]):
+        self.total = total
+        self.active = 0
+        self.lanes = {p: Lane(limit=limit, weight=weight) for p, (limit, weight) in lanes.items()}
+
+    def _has_room(self, lane: Lane) -> bool:
+        return self.active < self.total and lane.active < lane.limit
+
+    @asynccontextmanager
+    async def acquire(self, value: Priority, timeout: Optional[float] = None):
+        """ Слот полосы на время запроса; timeout=None - ждать без ограничения """
+        lane = self.lanes[value]
+        waited = await self._acquire(lane, value, timeout)
+        try:
+            yield waited
+        finally:
+            self._release(lane)
+
+    async def _acquire(self, lane: Lane, value: Priority, timeout: Optional[float]) -> float:
+        if self._has_room(lane) and not lane.waiters:
+            self._take(lane)
+            return 0.0
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        lane.stats.queued += 1
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+        except TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(lane)
+            lane.stats.timed_out += 1
+            raise BulkheadFull(f'{value.value} lane', f'no slot in {timeout:.2f}s') from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(lane)
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            try:
+                lane.waiters.remove(waiter)
+            except ValueError:
+                pass
+        return time.perf_counter() - started
+
+    def _take(self, lane: Lane) -> None:
+        self.active += 1
+        lane.active += 1
+        lane.stats.admitted += 1
+
+    def _release(self, lane: Lane) -> None:
+        self.active -= 1
+        lane.active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """ Раздает свободные слоты ожидающим полосам по весам """
+        while self.active < self.total:
+            ready = [
+                lane for lane in self.lanes.values()
+                if lane.active < lane.limit and self._drop_cancelled(lane)
+            ]
+            if not ready:
+                return
+
+            # Плавный взвешенный round-robin (как в nginx upstream)
+            total_weight = sum(lane.weight for lane in ready)
+            for lane in ready:
+                lane.current_weight += lane.weight
+            chosen = max(ready, key=lambda lane: lane.current_weight)
+            chosen.current_weight -= total_weight
+
+            self._take(chosen)
+            chosen.waiters.popleft().set_result(None)
+
+    @staticmethod
+    def _drop_cancelled(lane: Lane) -> bool:
+        """ Убирает из начала очереди отмененных; есть ли живые ожидающие """
+        while lane.waiters and lane.waiters[0].done():
+            lane.waiters.popleft()
+        return bool(lane.waiters)
@@ -0,0 +1,19 @@
+import os
+from typing import Optional
+
+from src.logconf import opt_logger as log
+
+logger = log.setup_logger('readiness')
+
+
+def mark_ready(path: Optional[str]) -> None:
+    """ Бот прогрет и принимает апдейты: файл для readiness пробы """
+    logger.info('Bot is ready')
+    if path:
+        with open(path, 'w') as f:
+            f.write(str(os.getpid()))
+
+
+def mark_not_ready(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,54 @@
+import random
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class RetryStats:
+    """ Счетчики повторных запросов """
+
+    retries: int = 0              # Выполненных повторов
+    budget_exhausted: int = 0     # Повторов, отклоненных из-за бюджета
+    gave_up: int = 0              # Запросов, исчерпавших все попытки
+
+
+class RetryBudget:
+    """
+    Бюджет повторов (token bucket): каждый исходный запрос
+    добавляет ratio токена, каждый повтор тратит один токен.
+    Так повторы не превышают ~ratio от общего трафика и не
+    умножают нагрузку на Gateway во время сбоя. min_per_second
+    токенов начисляется всегда, чтобы при малом трафике
+    повторы тоже были возможны.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+
+        self._tokens = max_tokens
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated_at) * self.min_per_second)
+        self._updated_at = now
+
+    def deposit(self) -> None:
+        """ Учитывает исходный (не повторный) запрос """
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """ Разрешает один повтор, если в бюджете есть токен """
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """ Экспоненциальная задержка с полным джиттером (attempt с 1) """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
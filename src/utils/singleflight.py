@@ -0,0 +1,58 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from src.logconf import opt_logger as log
+from src.utils.deadline import detached, wait_within
+
+logger = log.setup_logger('singleflight')
+
+
+@dataclass
+class SingleFlightStats:
+    """ Счетчики объединенных запросов """
+
+    calls: int = 0          # Всего вызовов do()
+    executed: int = 0       # Реально выполненных запросов
+    coalesced: int = 0      # Вызовов, которые дождались чужого запроса
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые вызовы в один:
+    пока запрос с ключом key выполняется, остальные
+    вызывающие ждут тот же результат (или ту же ошибку).
+    Запрос идет без дедлайна первого вызывающего,
+    каждый ждет его не дольше собственного дедлайна
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.stats = SingleFlightStats()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]], name: Optional[str] = None) -> Any:
+        self.stats.calls += 1
+
+        future = self._in_flight.get(key)
+        if future is None:
+            self.stats.executed += 1
+            future = asyncio.create_task(func(), context=detached())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        else:
+            self.stats.coalesced += 1
+            logger.debug('Coalesced in-flight call %s', key)
+
+        # shield: отмена (или дедлайн) одного вызывающего не отменяет запрос для остальных
+        return await wait_within(future, name or str(key))
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Помечаем ошибку как полученную, даже если все ожидающие отменились
+        if not future.cancelled():
+            future.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
@@ -0,0 +1,6 @@
+import os
+
+# Конфигурация читается из окружения при импорте src.config
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('GATEWAY_HOST', 'gateway')
+os.environ.setdefault('GATEWAY_PORT', '8000')
@@ -0,0 +1,56 @@
+import asyncio
+import dataclasses
+
+import httpx
+import pytest
+
+from src.config import config
+from src.exc import GatewayUnavailable
+from src.services.gateway import GatewayService
+from src.utils.circuit_breaker import CircuitState
+
+SETTINGS = dataclasses.replace(
+    config.gateway,
+    breaker_failure_threshold=2,
+    breaker_recovery_timeout=60.0,
+    retry_attempts=3,
+    retry_base_delay=0.0,
+    retry_max_delay=0.0,
+    cache_enabled=False,
+    batch_enabled=True,
+)
+
+
+def gateway_with(handler) -> GatewayService:
+    gateway = GatewayService('gateway', 8000, SETTINGS)
+    gateway.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return gateway
+
+
+def test_bulk_request_retries_transient_errors():
+    """ 503 пакетного запроса повторяется, как у одиночного GET """
+    statuses = [503]
+
+    def handler(request):
+        if statuses:
+            return httpx.Response(statuses.pop())
+        ids = request.url.params.get_list('user_id')
+        return httpx.Response(200, json={'items': {i: {'user_id': int(i), 'is_active': True} for i in ids}})
+
+    gateway = gateway_with(handler)
+    result = asyncio.run(gateway._bulk_get('payment_data', None, [1, 2]))
+
+    assert result == {1: {'user_id': 1, 'is_active': True}, 2: {'user_id': 2, 'is_active': True}}
+    assert gateway.retry_stats.retries == 1
+    assert 'payment_data' not in gateway.bulk_unsupported
+
+
+def test_bulk_outage_opens_the_breaker():
+    """ Недоступный Gateway размыкает цепь и при включенной пакетной загрузке """
+    gateway = gateway_with(lambda request: httpx.Response(503))
+
+    with pytest.raises(Exception) as error:
+        asyncio.run(gateway._bulk_get('payment_data', None, [1, 2]))
+
+    assert isinstance(error.value, GatewayUnavailable)
+    assert gateway._breaker('payment_data').state is CircuitState.OPEN
@@ -0,0 +1,84 @@
+import asyncio
+import dataclasses
+
+import httpx
+import pytest
+
+from src.config import config
+from src.exc import GatewayUnavailable
+from src.services.gateway import GatewayService
+from src.utils.circuit_breaker import CircuitState
+
+SETTINGS = dataclasses.replace(
+    config.gateway,
+    breaker_failure_threshold=1,
+    breaker_recovery_timeout=0.0,
+    breaker_half_open_calls=1,
+    retry_attempts=1,
+    cache_enabled=False,
+    batch_enabled=False,
+)
+
+
+def gateway_with(handler) -> GatewayService:
+    gateway = GatewayService('gateway', 8000, SETTINGS)
+    gateway.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return gateway
+
+
+def test_unexpected_error_in_half_open_probe_frees_the_slot():
+    """ Пробный запрос, упавший не HTTP ошибкой, не оставляет цепь в half-open навсегда """
+    gateway = gateway_with(lambda request: httpx.Response(200))
+    breaker = gateway._breaker('payment_data')
+
+    async def scenario():
+        async def unreachable():
+            raise httpx.ConnectError('connection refused')
+
+        with pytest.raises(httpx.ConnectError):
+            await gateway._protected('payment_data', unreachable)
+        assert breaker.state is CircuitState.HALF_OPEN
+
+        async def broken():
+            raise ValueError('not JSON')
+
+        with pytest.raises(ValueError):
+            await gateway._protected('payment_data', broken)
+
+        # Gateway восстановился: следующая проба проходит и замыкает цепь
+        async def healthy():
+            return 'ok'
+
+        assert await gateway._protected('payment_data', healthy) == 'ok'
+        assert breaker.state is CircuitState.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_non_json_200_counts_as_failure():
+    """ 200 с HTML вместо JSON размыкает цепь, а после восстановления Gateway она замыкается """
+    healthy = False
+
+    def handler(request):
+        if healthy:
+            return httpx.Response(200, json={'user_id': 5, 'is_active': True})
+        return httpx.Response(200, text='<html>')
+
+    gateway = gateway_with(handler)
+    breaker = gateway._breaker('payment_data')
+
+    async def scenario():
+        nonlocal healthy
+        with pytest.raises(Exception) as error:
+            await gateway._execute_request('payment_data', 'get', 5)
+        assert not isinstance(error.value, GatewayUnavailable)
+        assert breaker.state is CircuitState.HALF_OPEN
+
+        with pytest.raises(Exception):
+            await gateway._execute_request('payment_data', 'get', 5)
+
+        healthy = True
+        assert await gateway._execute_request('payment_data', 'get', 5) == {'user_id': 5, 'is_active': True}
+        assert breaker.state is CircuitState.CLOSED
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from src.exc import DeadlineExceeded
+from src.utils.deadline import deadline, time_left
+from src.utils.singleflight import SingleFlight
+
+
+def test_first_callers_deadline_does_not_apply_to_coalesced_callers():
+    """ Дедлайн начавшего запрос не обрывает его для тех, кто присоединился без дедлайна """
+    flight = SingleFlight()
+    seen_deadlines = []
+
+    async def slow():
+        seen_deadlines.append(time_left())
+        await asyncio.sleep(0.1)
+        return 'done'
+
+    async def hurried():
+        with deadline(0.02):
+            return await flight.do('nickname', slow, name='nickname_exists')
+
+    async def scenario():
+        return await asyncio.gather(hurried(), flight.do('nickname', slow), return_exceptions=True)
+
+    first, second = asyncio.run(scenario())
+    assert isinstance(first, DeadlineExceeded)
+    assert second == 'done'
+    assert seen_deadlines == [None]
+    assert flight.stats.executed == 1
+
+
+def test_waiter_deadline_still_applies_to_its_own_wait():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.1)
+
+    async def scenario():
+        with deadline(0.02):
+            await flight.do('key', slow)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())